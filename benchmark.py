@@ -0,0 +1,198 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+from block.calculations import (
+    MAX_BLOCK_WEIGHT,
+    calculate_total_weight_and_fee,
+    generate_merkle_root,
+)
+from block.witness import calculate_witness_commitment
+from mempool_cache import summarize_transaction
+from mempool_loader import MEMPOOL_DIR, get_fee, pre_process_transaction, scan_mempool
+from mempool_table import MempoolTable
+from mine.miner import search_nonce_range
+from mine.transaction import Transaction
+from transaction_serialization import hash_transaction, serialize_transaction
+from txid_serialization_backup import serialize
+from utilities import hash256
+
+BASELINE_FILE = "benchmark-baseline.json"
+MINE_NONCE_RANGE = 200000
+# A stage regresses when its best time exceeds the baseline's by this much.
+# The minimum is compared because it is far less noisy than the median.
+REGRESSION_TOLERANCE = 0.2
+
+
+def load_json(filenames):
+    transactions = []
+    for filename in filenames:
+        with open(os.path.join(MEMPOOL_DIR, filename), "rb") as file:
+            transactions.append(json.loads(file.read()))
+    return transactions
+
+
+def stage_hex_serialize(transactions):
+    for tx in transactions:
+        serialize(tx)
+        serialize_transaction(tx)
+
+
+def stage_hex_hash(serialized):
+    for stripped, full in serialized:
+        hash256(stripped)
+        hash256(full)
+
+
+def stage_bytes_serialize_and_hash(transactions):
+    for tx in transactions:
+        hash_transaction(tx)
+
+
+def stage_candidates(transactions):
+    # Fee-rate ordering straight from parsed JSON; no witness is decoded.
+    models = [pre_process_transaction(Transaction.from_json(tx)) for tx in transactions]
+    models.sort(key=lambda tx: tx.fee / tx.weight, reverse=True)
+
+
+def stage_fees(models, block_transactions):
+    for tx in models:
+        get_fee(tx)
+    calculate_total_weight_and_fee(block_transactions)
+
+
+def stage_fee_table(summaries):
+    # The same questions answered from columns: totals, fee-rate order, a
+    # weight cutoff and fee-rate percentiles.
+    table = MempoolTable(summaries)
+    table.totals(table.cutoff())
+    table.feerate_percentiles()
+    table.feerate_histogram()
+
+
+def fill_block(transactions):
+    selected = []
+    weight = 0
+    for tx in transactions:
+        if weight + tx["weight"] > MAX_BLOCK_WEIGHT:
+            break
+        selected.append(tx)
+        weight += tx["weight"]
+    return selected
+
+
+def stage_mine(header_prefix):
+    # Target 0 is never met, so every run hashes exactly MINE_NONCE_RANGE
+    # headers.
+    search_nonce_range(header_prefix, 0, MINE_NONCE_RANGE, 0)
+
+
+def build_stages():
+    filenames = scan_mempool()
+    transactions = load_json(filenames)
+    serialized = [(serialize(tx), serialize_transaction(tx)) for tx in transactions]
+    models = [Transaction.from_json(tx) for tx in transactions]
+    preprocessed = [pre_process_transaction(tx, with_wtxid=True) for tx in models]
+    summaries = [summarize_transaction(tx, None) for tx in preprocessed]
+    txids = [summary["txid"] for summary in summaries]
+    block_transactions = fill_block(summaries)
+    header_prefix = bytes(76)
+
+    return {
+        "json_load": lambda: load_json(filenames),
+        "hex_serialize": lambda: stage_hex_serialize(transactions),
+        "hex_txid_wtxid_hash": lambda: stage_hex_hash(serialized),
+        "build_models": lambda: [Transaction.from_json(tx) for tx in transactions],
+        "bytes_serialize_and_hash": lambda: stage_bytes_serialize_and_hash(models),
+        "fee_rate_candidates": lambda: stage_candidates(transactions),
+        "merkle_root": lambda: generate_merkle_root(txids),
+        "witness_commitment": lambda: calculate_witness_commitment(summaries),
+        "fee_aggregation": lambda: stage_fees(models, block_transactions),
+        "fee_table": lambda: stage_fee_table(summaries),
+        "mine_fixed_range": lambda: stage_mine(header_prefix),
+    }, len(transactions)
+
+
+def run(repeat):
+    stages, transaction_count = build_stages()
+    results = {}
+    for name, stage in stages.items():
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            stage()
+            timings.append(time.perf_counter() - start)
+        results[name] = {
+            "median_s": round(statistics.median(timings), 6),
+            "min_s": round(min(timings), 6),
+        }
+    return {
+        "transactions": transaction_count,
+        "repeat": repeat,
+        "mine_nonce_range": MINE_NONCE_RANGE,
+        "stages": results,
+    }
+
+
+def compare(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    regressions = []
+    for name, stage in results["stages"].items():
+        previous = baseline.get("stages", {}).get(name)
+        if previous is None:
+            continue
+        ratio = stage["min_s"] / previous["min_s"] if previous["min_s"] else 1
+        stage["baseline_ratio"] = round(ratio, 3)
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time each stage of block building")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="store this run as the baseline instead of comparing against it",
+    )
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    parser.add_argument("--output", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = run(args.repeat)
+    # Timings only compare on the machine that recorded them, so no
+    # baseline is committed; each machine saves its own.
+    regressions = None
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+        results["baseline"] = "saved"
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        results["baseline"] = args.baseline
+    else:
+        results["baseline"] = "no baseline"
+        print(
+            f"Warning: no baseline at {args.baseline}, nothing was compared; "
+            "record one with --save-baseline",
+            file=sys.stderr,
+        )
+    results["regressions"] = regressions
+
+    output = json.dumps(results, indent=2, sort_keys=True)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    if regressions:
+        print(f"Regressions: {', '.join(regressions)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,22 @@
-from utilities import hash256
 import hashlib
 
+from block.merkle import MerkleTree
+
+MAX_BLOCK_WEIGHT = 4000000
+
 
 def generate_merkle_root(txids):
     if len(txids) == 0:
         return None
 
-    level = [bytes.fromhex(txid)[::-1].hex() for txid in txids]
+    return MerkleTree([bytes.fromhex(txid)[::-1] for txid in txids]).root().hex()
+
 
-    while len(level) > 1:
-        next_level = []
-        for i in range(0, len(level), 2):
-            if i + 1 == len(level):
-                pair_hash = hash256(level[i] + level[i])
-            else:
-                pair_hash = hash256(level[i] + level[i + 1])
-            next_level.append(pair_hash)
-        level = next_level
-    return level[0]
+def merkle_root_from_branch(leaf, branch):
+    node = leaf
+    for sibling in branch:
+        node = hashlib.sha256(hashlib.sha256(node + sibling).digest()).digest()
+    return node
 
 
 def target_to_bits(target):
@@ -39,14 +38,6 @@ def target_to_bits(target):
     return hex(bits)
 
 
-def hash256(hex):
-    binary = bytes.fromhex(hex)
-    hash1 = hashlib.sha256(binary).digest()
-    hash2 = hashlib.sha256(hash1).digest()
-    result = hash2.hex()
-    return result
-
-
 def calculate_total_weight_and_fee(transactions):
     total_weight = 0
     total_fee = 0
@@ -54,7 +45,7 @@ def calculate_total_weight_and_fee(transactions):
         total_weight += tx["weight"]
         total_fee += tx["fee"]
 
-    if total_weight > 4000000:
+    if total_weight > MAX_BLOCK_WEIGHT:
         raise ValueError("Block exceeds maximum weight")
 
     return total_weight, total_fee
@@ -1,8 +1,24 @@
 import binascii
 import hashlib
 
+DIFFICULTY_TARGET = "0000ffff00000000000000000000000000000000000000000000000000000000"
+BLOCK_VERSION = 4
+BLOCK_BITS = 0x1F00FFFF
+PREV_BLOCK_HASH = bytes(32)
 
-def validate_header(header, target_difficulty):
+
+def header_prefix(merkle_root, ntime, version=BLOCK_VERSION, bits=BLOCK_BITS):
+    # The first 76 bytes of a header; the nonce completes it.
+    return (
+        version.to_bytes(4, "little")
+        + PREV_BLOCK_HASH
+        + merkle_root
+        + ntime.to_bytes(4, "little")
+        + bits.to_bytes(4, "little")
+    )
+
+
+def validate_header(header, target_difficulty=DIFFICULTY_TARGET):
     header_bytes = binascii.unhexlify(header)
     if len(header_bytes) != 80:
         raise ValueError("Invalid header length")
@@ -0,0 +1,239 @@
+import heapq
+
+from block.merkle import build_block_trees
+from block.template import COINBASE_RESERVED_WEIGHT, build_block_template
+from block.calculations import MAX_BLOCK_WEIGHT
+from mempool_index import feerate
+
+# Once this share of the block has been swapped in or out since the last
+# full selection, the greedy patches have drifted enough to start over.
+REBUILD_FRACTION = 0.25
+
+
+def _leaf(txid):
+    return bytes.fromhex(txid)[::-1]
+
+
+class IncrementalTemplate:
+    # Block template kept in step with an OutpointIndex of valid
+    # transactions. Additions and removals are patched into the selected
+    # list and both Merkle trees one leaf at a time, so publishing a new
+    # template costs O(change * log n) instead of a full selection.
+    def __init__(self, index, max_weight=MAX_BLOCK_WEIGHT - COINBASE_RESERVED_WEIGHT):
+        self.index = index
+        self.max_weight = max_weight
+        self.rebuild()
+
+    def rebuild(self):
+        self.selected = build_block_template(
+            list(self.index.transactions.values()), self.max_weight, self.index
+        )
+        self.position = {tx["txid"]: i for i, tx in enumerate(self.selected)}
+        self.block_weight = sum(tx["weight"] for tx in self.selected)
+        self.txid_tree, self.wtxid_tree = build_block_trees(
+            [_leaf(tx["txid"]) for tx in self.selected],
+            [_leaf(tx["wtxid"]) for tx in self.selected],
+        )
+        # Candidates to append: out of the block with every in-mempool
+        # parent in it. Evictable: in the block with no child in it. Both
+        # heaps are checked lazily when popped.
+        self.waiting = []
+        self.leaves = []
+        for tx in self.index.transactions.values():
+            self._push_candidate(tx)
+        for tx in self.selected:
+            self._push_leaf(tx)
+        self.churn = 0
+
+    def __len__(self):
+        return len(self.selected)
+
+    def total_fee(self):
+        return sum(tx["fee"] for tx in self.selected)
+
+    def _parents_in_block(self, transaction):
+        return all(
+            txid in self.position
+            for txid, _ in transaction["spends"]
+            if txid in self.index
+        )
+
+    def _push_candidate(self, transaction):
+        if transaction["txid"] not in self.position and self._parents_in_block(
+            transaction
+        ):
+            heapq.heappush(self.waiting, (-feerate(transaction), transaction["txid"]))
+
+    def _push_leaf(self, transaction):
+        heapq.heappush(self.leaves, (feerate(transaction), transaction["txid"]))
+
+    def _is_leaf(self, txid):
+        return txid in self.position and not any(
+            child in self.position for child in self.index.children(txid)
+        )
+
+    def _append(self, transaction):
+        self.position[transaction["txid"]] = len(self.selected)
+        self.selected.append(transaction)
+        self.block_weight += transaction["weight"]
+        self.txid_tree.append(_leaf(transaction["txid"]))
+        self.wtxid_tree.append(_leaf(transaction["wtxid"]))
+        self.churn += transaction["weight"]
+        self._push_leaf(transaction)
+        for child in self.index.children(transaction["txid"]):
+            self._push_candidate(self.index.transactions[child])
+
+    def _pop_last(self):
+        transaction = self.selected.pop()
+        del self.position[transaction["txid"]]
+        self.txid_tree.pop()
+        self.wtxid_tree.pop()
+        return transaction
+
+    def _discard(self, txid):
+        # The last transaction moves into the hole when that keeps every
+        # parent ahead of its children; otherwise the tail after the hole is
+        # shifted down and rehashed in one splice.
+        i = self.position[txid]
+        transaction = self.selected[i]
+        self.block_weight -= transaction["weight"]
+        self.churn += transaction["weight"]
+        if i == len(self.selected) - 1:
+            self._pop_last()
+        elif all(
+            self.position.get(parent, -1) < i
+            for parent, _ in self.selected[-1]["spends"]
+        ):
+            last = self._pop_last()
+            self.selected[i] = last
+            del self.position[txid]
+            self.position[last["txid"]] = i
+            self.txid_tree.replace(i + 1, _leaf(last["txid"]))
+            self.wtxid_tree.replace(i + 1, _leaf(last["wtxid"]))
+        else:
+            tail = self.selected[i + 1 :]
+            del self.selected[i:]
+            del self.position[txid]
+            for moved in tail:
+                self.position[moved["txid"]] = len(self.selected)
+                self.selected.append(moved)
+            self.txid_tree.splice(i + 1, b"".join(_leaf(tx["txid"]) for tx in tail))
+            self.wtxid_tree.splice(i + 1, b"".join(_leaf(tx["wtxid"]) for tx in tail))
+        for parent, _ in transaction["spends"]:
+            if parent in self.position:
+                self._push_leaf(self.selected[self.position[parent]])
+        return transaction
+
+    def _make_room(self, transaction):
+        # Evicts block leaves paying a lower fee rate than `transaction`
+        # until it fits, as long as the fee given up stays below its own.
+        # Leaves nothing changed and returns False when that is not possible.
+        needed = self.block_weight + transaction["weight"] - self.max_weight
+        rate = feerate(transaction)
+        parents = {txid for txid, _ in transaction["spends"]}
+        taken = []
+        spared = []  # leaves the candidate spends; still leaves afterwards
+        victims = []
+        freed = fee = 0
+        while freed < needed and self.leaves and self.leaves[0][0] < rate:
+            entry = heapq.heappop(self.leaves)
+            txid = entry[1]
+            # Stale and duplicate entries are dropped for good; a block
+            # transaction becomes a leaf again through _discard.
+            if txid in victims or not self._is_leaf(txid):
+                continue
+            if txid in parents:
+                spared.append(entry)
+                continue
+            victim = self.selected[self.position[txid]]
+            taken.append(entry)
+            victims.append(txid)
+            freed += victim["weight"]
+            fee += victim["fee"]
+        for entry in spared:
+            heapq.heappush(self.leaves, entry)
+        if freed < needed or fee >= transaction["fee"]:
+            for entry in taken:
+                heapq.heappush(self.leaves, entry)
+            return False
+        for txid in victims:
+            self._push_candidate(self._discard(txid))
+        return True
+
+    def _fill(self):
+        # Greedy top-up from the waiting heap. It stops at the first
+        # candidate that does not fit; the next rebuild catches the rest.
+        while self.waiting:
+            _, txid = self.waiting[0]
+            transaction = self.index.transactions.get(txid)
+            if (
+                transaction is None
+                or txid in self.position
+                or not self._parents_in_block(transaction)
+            ):
+                heapq.heappop(self.waiting)
+                continue
+            if self.block_weight + transaction["weight"] > self.max_weight:
+                if not self._make_room(transaction):
+                    return
+            heapq.heappop(self.waiting)
+            self._append(transaction)
+
+    def remove(self, txids):
+        # Drops transactions that left the mempool together with their
+        # descendants. Returns the removed transactions.
+        removed = []
+        for txid in txids:
+            removed.extend(self.index.remove_with_descendants(txid))
+        self._evict(removed)
+        return removed
+
+    def add(self, transactions):
+        # Admits new, already validated transactions. Returns the ones that
+        # lost a conflict or were evicted by one.
+        rejected = []
+        evicted = []
+        for transaction in transactions:
+            added, removed = self.index.admit(transaction)
+            if not added:
+                rejected.append(transaction)
+            else:
+                self._withdraw_children(transaction["txid"])
+            evicted.extend(removed)
+        self._evict(evicted)
+        for transaction in transactions:
+            if transaction["txid"] in self.index:
+                self._push_candidate(transaction)
+        self._fill()
+        return rejected + evicted
+
+    def _withdraw_children(self, txid):
+        # Children that arrived before this parent were taken to spend
+        # confirmed outputs and may already be in the block. They leave it,
+        # last first, and come back through the waiting heap once the
+        # parent is in.
+        pending = list(self.index.children(txid))
+        in_block = set()
+        while pending:
+            child = pending.pop()
+            if child in self.position and child not in in_block:
+                in_block.add(child)
+                pending.extend(self.index.children(child))
+        for child in sorted(in_block, key=self.position.get, reverse=True):
+            self._discard(child)
+
+    def _evict(self, removed):
+        # Children are discarded before their parents so every swap keeps
+        # the block in dependency order.
+        for transaction in reversed(removed):
+            if transaction["txid"] in self.position:
+                self._discard(transaction["txid"])
+        if removed:
+            self._fill()
+
+    def publish(self):
+        # Current selection and both tree roots, after a full selection if
+        # the incremental patches have churned through too much of the block.
+        if self.churn > self.max_weight * REBUILD_FRACTION:
+            self.rebuild()
+        return self.selected, self.txid_tree, self.wtxid_tree
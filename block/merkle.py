@@ -0,0 +1,132 @@
+import hashlib
+
+import metrics
+from utilities import hash256_many
+
+HASH_SIZE = 32
+
+
+def _hash_level(level):
+    # Parent level of `level`, a contiguous run of 32-byte nodes. An odd last
+    # node is paired with itself, as in Bitcoin.
+    if len(level) // HASH_SIZE % 2:
+        level = level + level[-HASH_SIZE:]
+    return bytearray(hash256_many(level, 2 * HASH_SIZE))
+
+
+def _hash_pair(left, right):
+    return hashlib.sha256(hashlib.sha256(left + right).digest()).digest()
+
+
+class MerkleTree:
+    # Every level is kept as one bytearray of 32-byte nodes in internal byte
+    # order, so proofs and single-leaf updates only touch one node per level.
+    def __init__(self, leaves=b""):
+        if not isinstance(leaves, (bytes, bytearray, memoryview)):
+            leaves = b"".join(leaves)
+        if len(leaves) % HASH_SIZE:
+            raise ValueError("Merkle leaves must be 32 bytes each")
+        self.levels = [bytearray(leaves)]
+        while len(self.levels[-1]) > HASH_SIZE:
+            self.levels.append(_hash_level(self.levels[-1]))
+
+    def __len__(self):
+        return len(self.levels[0]) // HASH_SIZE
+
+    def node(self, depth, index):
+        offset = index * HASH_SIZE
+        return bytes(self.levels[depth][offset : offset + HASH_SIZE])
+
+    def root(self):
+        if not len(self):
+            return None
+        return self.node(len(self.levels) - 1, 0)
+
+    def branch(self, index):
+        # Sibling hashes from leaf `index` up to (not including) the root.
+        if not 0 <= index < len(self):
+            raise IndexError("Merkle leaf index out of range")
+        proof = []
+        for depth in range(len(self.levels) - 1):
+            count = len(self.levels[depth]) // HASH_SIZE
+            sibling = index ^ 1
+            proof.append(self.node(depth, sibling if sibling < count else index))
+            index //= 2
+        return proof
+
+    def replace(self, index, leaf):
+        if not 0 <= index < len(self):
+            raise IndexError("Merkle leaf index out of range")
+        offset = index * HASH_SIZE
+        self.levels[0][offset : offset + HASH_SIZE] = leaf
+        self._update_path(index)
+
+    def append(self, leaf):
+        if len(leaf) != HASH_SIZE:
+            raise ValueError("Merkle leaves must be 32 bytes each")
+        self.levels[0] += leaf
+        self._update_path(len(self) - 1)
+
+    def splice(self, index, leaves=b""):
+        # Replaces every leaf from `index` on with `leaves`. Only nodes to
+        # the right of the change are hashed again, one level at a time.
+        if not 0 <= index <= len(self):
+            raise IndexError("Merkle leaf index out of range")
+        if len(leaves) % HASH_SIZE:
+            raise ValueError("Merkle leaves must be 32 bytes each")
+        del self.levels[0][index * HASH_SIZE :]
+        self.levels[0] += leaves
+        depth = 0
+        while len(self.levels[depth]) > HASH_SIZE:
+            if depth + 1 == len(self.levels):
+                self.levels.append(bytearray())
+            upper = self.levels[depth + 1]
+            del upper[index // 2 * HASH_SIZE :]
+            upper += _hash_level(self.levels[depth][(index & ~1) * HASH_SIZE :])
+            index //= 2
+            depth += 1
+        del self.levels[depth + 1 :]
+
+    def pop(self):
+        if not len(self):
+            raise IndexError("pop from an empty Merkle tree")
+        leaf = self.node(0, len(self) - 1)
+        self.splice(len(self) - 1)
+        return leaf
+
+    def _update_path(self, index):
+        depth = 0
+        while len(self.levels[depth]) > HASH_SIZE:
+            level = self.levels[depth]
+            count = len(level) // HASH_SIZE
+            left = index & ~1
+            right = left + 1 if left + 1 < count else left
+            parent = _hash_pair(self.node(depth, left), self.node(depth, right))
+            if depth + 1 == len(self.levels):
+                self.levels.append(bytearray())
+            upper = self.levels[depth + 1]
+            offset = index // 2 * HASH_SIZE
+            if offset == len(upper):
+                upper += parent
+            else:
+                upper[offset : offset + HASH_SIZE] = parent
+            index //= 2
+            depth += 1
+
+
+def verify_branch(leaf, index, branch, root):
+    node = leaf
+    for sibling in branch:
+        node = _hash_pair(sibling, node) if index & 1 else _hash_pair(node, sibling)
+        index //= 2
+    return node == root
+
+
+@metrics.timed("merkle")
+def build_block_trees(txids, wtxids):
+    # Txid and wtxid trees for the non-coinbase transactions of a block, in
+    # internal byte order. Leaf 0 of both is the coinbase: always zero in the
+    # wtxid tree, and a placeholder in the txid tree until the coinbase is
+    # known (fold it through branch(0) or replace(0, ...)).
+    coinbase = bytes(HASH_SIZE)
+    return MerkleTree([coinbase, *txids]), MerkleTree([coinbase, *wtxids])
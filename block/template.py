@@ -0,0 +1,118 @@
+import heapq
+
+import metrics
+from block.calculations import MAX_BLOCK_WEIGHT
+from mempool_index import build_outpoint_index
+
+# Room left for the block header and the coinbase transaction.
+COINBASE_RESERVED_WEIGHT = 4000
+
+
+def build_dependency_graph(transactions, index):
+    # parents[i] / children[i] hold indices of in-mempool transactions only;
+    # the outpoint index already knows which spent txids are in the mempool.
+    position = {tx["txid"]: i for i, tx in enumerate(transactions)}
+    parents = []
+    children = []
+    for i, tx in enumerate(transactions):
+        parents.append({position[txid] for txid in index.parents(tx)} - {i})
+        children.append(
+            [
+                position[txid]
+                for txid in index.children(tx["txid"])
+                if txid != tx["txid"]
+            ]
+        )
+    return parents, children
+
+
+def topological_order(parents, children):
+    pending = [len(p) for p in parents]
+    ready = [i for i, count in enumerate(pending) if count == 0]
+    heapq.heapify(ready)
+    order = []
+    while ready:
+        i = heapq.heappop(ready)
+        order.append(i)
+        for child in children[i]:
+            pending[child] -= 1
+            if pending[child] == 0:
+                heapq.heappush(ready, child)
+    # Anything left over sits on a dependency cycle and can never be mined.
+    return order
+
+
+def _feerate_key(fee, weight):
+    return -fee / weight
+
+
+@metrics.timed("selection")
+def build_block_template(
+    transactions, max_weight=MAX_BLOCK_WEIGHT - COINBASE_RESERVED_WEIGHT, index=None
+):
+    # Greedy ancestor-package selection: every transaction is scored by the
+    # fee rate of itself plus its not yet selected ancestors. After a package
+    # is added, the ancestor totals of its descendants are reduced by what
+    # was just included (the "modified fee") and they are pushed again.
+    if index is None:
+        index, _ = build_outpoint_index(transactions)
+        transactions = list(index.transactions.values())
+    parents, children = build_dependency_graph(transactions, index)
+    order = topological_order(parents, children)
+
+    ancestors = [None] * len(transactions)
+    descendants = [[] for _ in transactions]
+    ancestor_fee = [0] * len(transactions)
+    ancestor_weight = [0] * len(transactions)
+    for i in order:
+        tx_ancestors = set(parents[i])
+        for parent in parents[i]:
+            tx_ancestors |= ancestors[parent]
+        ancestors[i] = tx_ancestors
+        ancestor_fee[i] = transactions[i]["fee"]
+        ancestor_weight[i] = transactions[i]["weight"]
+        for ancestor in tx_ancestors:
+            descendants[ancestor].append(i)
+            ancestor_fee[i] += transactions[ancestor]["fee"]
+            ancestor_weight[i] += transactions[ancestor]["weight"]
+
+    # Sort key for moving a package into the block parent-first.
+    depth = [len(a) if a is not None else 0 for a in ancestors]
+
+    heap = [(_feerate_key(ancestor_fee[i], ancestor_weight[i]), i) for i in order]
+    heapq.heapify(heap)
+    in_block = [False] * len(transactions)
+    selected = []
+    block_weight = 0
+
+    while heap:
+        key, i = heapq.heappop(heap)
+        if in_block[i]:
+            continue
+        if key != _feerate_key(ancestor_fee[i], ancestor_weight[i]):
+            continue
+        if block_weight + ancestor_weight[i] > max_weight:
+            # Stays out unless a later pick shrinks its package.
+            continue
+
+        package = [a for a in ancestors[i] if not in_block[a]]
+        package.append(i)
+        package.sort(key=lambda j: (depth[j], j))
+        for j in package:
+            in_block[j] = True
+            selected.append(j)
+            block_weight += transactions[j]["weight"]
+            fee, weight = transactions[j]["fee"], transactions[j]["weight"]
+            for descendant in descendants[j]:
+                if in_block[descendant]:
+                    continue
+                ancestor_fee[descendant] -= fee
+                ancestor_weight[descendant] -= weight
+                key = _feerate_key(
+                    ancestor_fee[descendant], ancestor_weight[descendant]
+                )
+                heapq.heappush(heap, (key, descendant))
+
+    metrics.gauge("block_transactions", len(selected))
+    metrics.gauge("block_weight", block_weight)
+    return [transactions[i] for i in selected]
@@ -0,0 +1,106 @@
+import metrics
+from block.calculations import MAX_BLOCK_WEIGHT
+from block.header import DIFFICULTY_TARGET, validate_header
+from block.merkle import MerkleTree
+from block.witness import find_witness_commitment, witness_commitment_from_root
+from transaction_serialization import (
+    decode_transaction,
+    hash_transaction,
+    write_compact_size,
+)
+
+HEADER_SIZE = 80
+
+
+def read_block_file(path):
+    # output.txt: header hex, coinbase hex, then one txid per line starting
+    # with the coinbase txid.
+    with open(path) as file:
+        lines = file.read().split()
+    if len(lines) < 3:
+        raise ValueError(f"{path} needs a header, a coinbase and its txid")
+    return bytes.fromhex(lines[0]), bytes.fromhex(lines[1]), lines[2:]
+
+
+def parse_header(header):
+    if len(header) != HEADER_SIZE:
+        raise ValueError("Invalid header length")
+    return {
+        "version": int.from_bytes(header[0:4], "little"),
+        "prev_block": header[4:36],
+        "merkle_root": header[36:68],
+        "timestamp": int.from_bytes(header[68:72], "little"),
+        "bits": int.from_bytes(header[72:76], "little"),
+        "nonce": int.from_bytes(header[76:80], "little"),
+    }
+
+
+def verify_coinbase(raw):
+    # Returns the decoded coinbase, its txid and its weight.
+    coinbase = decode_transaction(raw)
+    if len(coinbase.vin) != 1:
+        raise ValueError("Coinbase must have exactly one input")
+    if coinbase.vin[0].txid != bytes(32) or coinbase.vin[0].vout != 0xFFFFFFFF:
+        raise ValueError("Coinbase input must spend the null outpoint")
+    txid, _, base_size, witness_size = hash_transaction(coinbase)
+    return coinbase, txid, base_size * 4 + witness_size
+
+
+@metrics.timed("verify")
+def verify_block(header, coinbase_raw, txids, mempool, target=DIFFICULTY_TARGET):
+    # Checks a mined block against a {txid: summary} index of the mempool and
+    # returns (total weight, total fee). Membership, duplicates and
+    # parent-before-child order are checked in one pass over the txids.
+    fields = parse_header(header)
+    validate_header(header.hex(), target)
+
+    coinbase, coinbase_txid, coinbase_weight = verify_coinbase(coinbase_raw)
+    if not txids or txids[0] != coinbase_txid[::-1].hex():
+        raise ValueError("First txid does not match the coinbase")
+
+    size_prefix = bytearray()
+    write_compact_size(size_prefix, len(txids))
+    total_weight = (HEADER_SIZE + len(size_prefix)) * 4 + coinbase_weight
+    total_fee = 0
+    seen = set()
+    leaves = [coinbase_txid]
+    wtxids = [bytes(32)]
+    for txid in txids[1:]:
+        summary = mempool.get(txid)
+        if summary is None:
+            raise ValueError(f"Invalid txid found in block: {txid}")
+        if txid in seen:
+            raise ValueError(f"Duplicate txid in block: {txid}")
+        for parent, _ in summary["spends"]:
+            if parent in mempool and parent not in seen:
+                raise ValueError(f"{txid} comes before its parent {parent}")
+        seen.add(txid)
+        total_weight += summary["weight"]
+        total_fee += summary["fee"]
+        leaves.append(bytes.fromhex(txid)[::-1])
+        wtxids.append(bytes.fromhex(summary["wtxid"])[::-1])
+
+    if total_weight > MAX_BLOCK_WEIGHT:
+        raise ValueError(f"Block weight {total_weight} exceeds {MAX_BLOCK_WEIGHT}")
+    if MerkleTree(leaves).root() != fields["merkle_root"]:
+        raise ValueError("Merkle root in header does not match the txids")
+
+    commitment = find_witness_commitment(
+        [output.scriptpubkey for output in coinbase.vout]
+    )
+    if commitment is None and leaves[1:] == wtxids[1:]:
+        # Without witness data a block needs no commitment.
+        return total_weight, total_fee
+    witness = coinbase.vin[0].witness
+    if len(witness) != 1 or len(witness[0]) != 32:
+        raise ValueError("Coinbase witness must be a single 32-byte reserved value")
+    expected = witness_commitment_from_root(MerkleTree(wtxids).root(), witness[0])
+    if commitment != expected:
+        raise ValueError("Invalid witness commitment in coinbase transaction")
+
+    return total_weight, total_fee
+
+
+def verify_block_file(path, mempool, target=DIFFICULTY_TARGET):
+    header, coinbase_raw, txids = read_block_file(path)
+    return verify_block(header, coinbase_raw, txids, mempool, target)
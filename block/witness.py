@@ -1,6 +1,5 @@
 import hashlib
-from block.calculations import generate_merkle_root
-from utilities import hash256
+from block.merkle import MerkleTree
 
 WITNESS_RESERVED_VALUE_HEX = (
     "0000000000000000000000000000000000000000000000000000000000000000"
@@ -10,26 +9,32 @@ WITNESS_RESERVED_VALUE_BYTES = bytes.fromhex(WITNESS_RESERVED_VALUE_HEX)
 WTXID_COINBASE = bytes(32).hex()
 
 
-def calculate_witness_commitment(transactions):
-    wtxids = [WTXID_COINBASE]
-    for tx in transactions:
-        wtxids.append(tx["wtxid"])
-    witness_root = generate_merkle_root(wtxids)
+WITNESS_COMMITMENT_HEADER = bytes.fromhex("6a24aa21a9ed")
+
 
-    witness_reserved_value_hex = WITNESS_RESERVED_VALUE_HEX
+def witness_commitment_from_root(
+    witness_root, reserved_value=WITNESS_RESERVED_VALUE_BYTES
+):
+    return (
+        hashlib.sha256(hashlib.sha256(witness_root + reserved_value).digest())
+        .digest()
+        .hex()
+    )
 
-    combined_data = witness_root + witness_reserved_value_hex
 
-    witness_commitment = hash256(combined_data)
+def calculate_witness_commitment(transactions):
+    wtxids = [bytes(32)]
+    for tx in transactions:
+        wtxids.append(bytes.fromhex(tx["wtxid"])[::-1])
+    witness_root = MerkleTree(wtxids).root()
 
-    return witness_commitment
+    return witness_commitment_from_root(witness_root)
 
 
-def verify_witness_commitment(coinbase_tx, witness_commitment):
-    for output in coinbase_tx["vout"]:
-        script_hex = output["scriptPubKey"]["hex"]
-        if script_hex.startswith("6a24aa21a9ed") and script_hex.endswith(
-            witness_commitment
-        ):
-            return True
-    return False
+def find_witness_commitment(scriptpubkeys):
+    # BIP141: the commitment is in the last output whose script starts with
+    # OP_RETURN 0x24 aa21a9ed. Returns it as hex, or None.
+    for script in reversed(scriptpubkeys):
+        if len(script) >= 38 and script.startswith(WITNESS_COMMITMENT_HEADER):
+            return script[6:38].hex()
+    return None
@@ -1,8 +1,42 @@
 from utilities import hash256, reverse_bytes
-from transaction_serialization import serialize_transaction
+from transaction_serialization import (
+    decode_transaction,
+    encode_transaction,
+    serialize_transaction,
+)
 
+COINBASE_SCRIPTSIG = (
+    "03233708184d696e656420627920416e74506f6f6c373946205b8160a4256c0000946e0100"
+)
+EXTRANONCE_SIZE = 8
 
-def serialize_coinbase_transaction(witness_commitment):
+
+def coinbase_scriptsig(extranonce=None):
+    # The extranonce is appended as one more push so rolling it changes the
+    # coinbase txid (and so the Merkle root) without touching anything else.
+    if extranonce is None:
+        return COINBASE_SCRIPTSIG
+    return (
+        COINBASE_SCRIPTSIG
+        + f"{EXTRANONCE_SIZE:02x}"
+        + extranonce.to_bytes(EXTRANONCE_SIZE, "little").hex()
+    )
+
+
+def split_coinbase(witness_commitment):
+    # The legacy (txid) encoding of the coinbase cut around its extranonce.
+    # hash256(head + extranonce + tail) is the coinbase txid for any 8-byte
+    # little-endian extranonce, so a remote miner can roll it on its own.
+    coinbase_hex, _ = serialize_coinbase_transaction(witness_commitment, 0)
+    stripped = bytearray()
+    encode_transaction(decode_transaction(bytes.fromhex(coinbase_hex)), stripped)
+    scriptsig = bytes.fromhex(coinbase_scriptsig(0))
+    end = stripped.index(scriptsig) + len(scriptsig)
+    return bytes(stripped[: end - EXTRANONCE_SIZE]), bytes(stripped[end:])
+
+
+def serialize_coinbase_transaction(witness_commitment, extranonce=None):
+    scriptsig = coinbase_scriptsig(extranonce)
     tx_dict = {
         "version": "01000000",
         "marker": "00",
@@ -12,8 +46,8 @@ def serialize_coinbase_transaction(witness_commitment):
             {
                 "txid": "0000000000000000000000000000000000000000000000000000000000000000",
                 "vout": "ffffffff",
-                "scriptsigsize": "25",
-                "scriptsig": "03233708184d696e656420627920416e74506f6f6c373946205b8160a4256c0000946e0100",
+                "scriptsigsize": f"{len(scriptsig) // 2:02x}",
+                "scriptsig": scriptsig,
                 "sequence": "ffffffff",
             }
         ],
@@ -50,15 +84,15 @@ def serialize_coinbase_transaction(witness_commitment):
             {
                 "txid": "0000000000000000000000000000000000000000000000000000000000000000",
                 "vout": int("ffffffff", 16),
-                "scriptsigsize": 37,
-                "scriptsig": "03233708184d696e656420627920416e74506f6f6c373946205b8160a4256c0000946e0100",
+                "scriptsigsize": len(scriptsig) // 2,
+                "scriptsig": scriptsig,
                 "sequence": int("ffffffff", 16),
             }
         ],
         "outputcount": "02",
         "vout": [
             {
-                "value": 2753059167,
+                "value": 1250006517,
                 "scriptpubkeysize": "19",
                 "scriptpubkey": "76a914edf10a7fac6b32e24daa5305c723f3de58db1bc888ac",
             },
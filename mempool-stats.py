@@ -0,0 +1,47 @@
+import argparse
+
+from block.calculations import MAX_BLOCK_WEIGHT
+from mempool_cache import load_snapshot
+from mempool_table import MempoolTable
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fee statistics for the mempool")
+    parser.add_argument(
+        "--max-weight",
+        type=int,
+        default=MAX_BLOCK_WEIGHT,
+        help="weight of the block the cutoff is computed for",
+    )
+    args = parser.parse_args()
+
+    table = MempoolTable(load_snapshot())
+    weight, fee = table.totals()
+    print(
+        f"Mempool: {len(table)} transactions, {int(table.vsize.sum())} vB, "
+        f"weight {weight}, fees {fee} sat"
+    )
+
+    block = table.cutoff(args.max_weight)
+    if len(block):
+        block_weight, block_fee = table.totals(block)
+        print(
+            f"Top block by fee rate: {len(block)} transactions, weight "
+            f"{block_weight}, fees {block_fee} sat, down to "
+            f"{table.feerate[block[-1]]:.2f} sat/vB"
+        )
+
+    rates = table.feerate_percentiles()
+    print(
+        "Fee rate by vsize: "
+        + ", ".join(f"p{p} {rate:.2f}" for p, rate in rates.items())
+        + " sat/vB"
+    )
+    print("sat/vB       vsize    txs")
+    for floor, vsize, count in table.feerate_histogram():
+        if count:
+            print(f"{floor:>6.0f}+ {vsize:>10} {count:>6}")
+
+
+if __name__ == "__main__":
+    main()
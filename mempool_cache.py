@@ -0,0 +1,185 @@
+import hashlib
+import mmap
+import os
+import struct
+import time
+
+import metrics
+from mempool_loader import MEMPOOL_DIR, stat_mempool, iter_mempool
+from transaction_serialization import transaction_wtxid
+from validations.policy import STRUCTURE_REASONS, check_structure
+
+CACHE_DIR = ".mempool-cache"
+INDEX_FILE = "snapshot.idx"
+PACK_FILE = "snapshot.pack"
+SNAPSHOT_MAGIC = b"MPSNAP03"
+
+# Index: magic, entry count, then one fixed-size entry per mempool file
+# pointing into the pack.
+_INDEX_HEADER = struct.Struct("<8sI")
+_INDEX_ENTRY = struct.Struct("<16sQqII")
+# Pack record: txid, wtxid, fee, input value, weight, base size, structure
+# reject reason (1 + its position in STRUCTURE_REASONS, 0 for none), number
+# of spent outpoints, followed by that many (prev txid, vout) pairs. Hashes
+# are kept in display order.
+_RECORD = struct.Struct("<32s32sqqIIBI")
+_OUTPOINT = struct.Struct("<32sI")
+_POLICY = {reason: code for code, reason in enumerate(STRUCTURE_REASONS)}
+
+
+def file_key(filename):
+    return hashlib.blake2b(filename.encode(), digest_size=16).digest()
+
+
+def summarize_transaction(transaction, filename):
+    return {
+        "filename": filename,
+        "txid": transaction.txid_hex,
+        "wtxid": transaction_wtxid(transaction)[::-1].hex(),
+        "fee": transaction.fee,
+        "input_value": sum(transaction.input_values),
+        "weight": transaction.weight,
+        "base_size": transaction.base_size,
+        "policy": check_structure(transaction),
+        "spends": transaction.spends(),
+    }
+
+
+def pack_summary(summary):
+    record = bytearray(
+        _RECORD.pack(
+            bytes.fromhex(summary["txid"]),
+            bytes.fromhex(summary["wtxid"]),
+            summary["fee"],
+            summary["input_value"],
+            summary["weight"],
+            summary["base_size"],
+            0 if summary["policy"] is None else 1 + _POLICY[summary["policy"]],
+            len(summary["spends"]),
+        )
+    )
+    for txid, vout in summary["spends"]:
+        record += _OUTPOINT.pack(bytes.fromhex(txid), vout)
+    return record
+
+
+def unpack_summary(buffer, offset, filename):
+    txid, wtxid, fee, input_value, weight, base_size, policy, spend_count = (
+        _RECORD.unpack_from(buffer, offset)
+    )
+    offset += _RECORD.size
+    spends = []
+    for _ in range(spend_count):
+        prev_txid, vout = _OUTPOINT.unpack_from(buffer, offset)
+        spends.append((prev_txid.hex(), vout))
+        offset += _OUTPOINT.size
+    return {
+        "filename": filename,
+        "txid": txid.hex(),
+        "wtxid": wtxid.hex(),
+        "fee": fee,
+        "input_value": input_value,
+        "weight": weight,
+        "base_size": base_size,
+        "policy": STRUCTURE_REASONS[policy - 1] if policy else None,
+        "spends": spends,
+    }
+
+
+def _map_file(path):
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def read_snapshot(cache_dir=CACHE_DIR):
+    # Returns ({key: (size, mtime_ns, offset, length)}, pack buffer), or an
+    # empty index when the snapshot is missing or was written by another
+    # format version.
+    try:
+        index = _map_file(os.path.join(cache_dir, INDEX_FILE))
+        pack = _map_file(os.path.join(cache_dir, PACK_FILE))
+    except FileNotFoundError:
+        return {}, b""
+
+    if len(index) < _INDEX_HEADER.size:
+        return {}, b""
+    magic, count = _INDEX_HEADER.unpack_from(index, 0)
+    if magic != SNAPSHOT_MAGIC:
+        return {}, b""
+
+    entries = {}
+    for key, size, mtime_ns, offset, length in _INDEX_ENTRY.iter_unpack(
+        index[_INDEX_HEADER.size : _INDEX_HEADER.size + count * _INDEX_ENTRY.size]
+    ):
+        entries[key] = (size, mtime_ns, offset, length)
+    return entries, pack
+
+
+def write_snapshot(records, cache_dir=CACHE_DIR):
+    # records: (filename, size, mtime_ns, packed summary) tuples. Both files
+    # are written next to the live ones and swapped in with os.replace so a
+    # crash never leaves a half-written snapshot behind.
+    os.makedirs(cache_dir, exist_ok=True)
+    index = bytearray(_INDEX_HEADER.pack(SNAPSHOT_MAGIC, len(records)))
+    pack = bytearray()
+    for filename, size, mtime_ns, record in records:
+        index += _INDEX_ENTRY.pack(
+            file_key(filename), size, mtime_ns, len(pack), len(record)
+        )
+        pack += record
+
+    for name, data in ((PACK_FILE, pack), (INDEX_FILE, index)):
+        path = os.path.join(cache_dir, name)
+        with open(path + ".tmp", "wb") as file:
+            file.write(data)
+        os.replace(path + ".tmp", path)
+
+
+@metrics.timed("ingest")
+def load_snapshot(directory=MEMPOOL_DIR, cache_dir=CACHE_DIR, workers=None):
+    # Summaries for every file in the mempool. Files whose (name, size,
+    # mtime) match the snapshot are read from the mapped pack; new or
+    # changed files are parsed again, and entries for files that no longer
+    # exist are dropped when the snapshot is rewritten.
+    start = time.perf_counter()
+    stats = stat_mempool(directory)
+    entries, pack = read_snapshot(cache_dir)
+
+    summaries = {}
+    records = {}
+    missing = []
+    for filename, size, mtime_ns in stats:
+        entry = entries.get(file_key(filename))
+        if entry is not None and entry[0] == size and entry[1] == mtime_ns:
+            summaries[filename] = unpack_summary(pack, entry[2], filename)
+            records[filename] = entry
+        else:
+            missing.append(filename)
+
+    if missing:
+        for filename, transaction in zip(
+            missing, iter_mempool(directory, missing, workers, with_wtxid=True)
+        ):
+            summary = summarize_transaction(transaction, filename)
+            summaries[filename] = summary
+            records[filename] = pack_summary(summary)
+
+    if missing or len(entries) != len(stats):
+        packed = []
+        for filename, size, mtime_ns in stats:
+            record = records[filename]
+            if isinstance(record, tuple):
+                record = pack[record[2] : record[2] + record[3]]
+            packed.append((filename, size, mtime_ns, record))
+        write_snapshot(packed, cache_dir)
+
+    metrics.count("ingest_cached_files", len(stats) - len(missing))
+    metrics.count("ingest_parsed_files", len(missing))
+    elapsed = time.perf_counter() - start
+    print(
+        f"Mempool snapshot: {len(stats) - len(missing)} cached, "
+        f"{len(missing)} parsed in {elapsed:.3f}s"
+    )
+    return [summaries[filename] for filename, _, _ in stats]
@@ -0,0 +1,120 @@
+from collections import defaultdict
+
+import metrics
+
+
+def feerate(transaction):
+    return transaction["fee"] / transaction["weight"]
+
+
+class OutpointIndex:
+    # Which mempool transaction spends each outpoint, plus the in-mempool
+    # parent/child links, kept up to date as transactions come and go.
+    def __init__(self):
+        self.spenders = {}  # (txid, vout) -> wtxid of the spending transaction
+        self.transactions = {}  # txid -> transaction
+        self.by_wtxid = {}  # wtxid -> transaction
+        # Spent txid -> txids of the mempool transactions spending it. The
+        # spent txid may be confirmed; it only becomes a parent link once
+        # that transaction is in the mempool too.
+        self.spent_by = defaultdict(set)
+
+    def __len__(self):
+        return len(self.transactions)
+
+    def __contains__(self, txid):
+        return txid in self.transactions
+
+    def conflicts(self, transaction):
+        # wtxids of mempool transactions spending any of the same outpoints.
+        return {
+            self.spenders[outpoint]
+            for outpoint in transaction["spends"]
+            if outpoint in self.spenders
+        } - {transaction["wtxid"]}
+
+    def parents(self, transaction):
+        return {txid for txid, _ in transaction["spends"] if txid in self.transactions}
+
+    def children(self, txid):
+        return self.spent_by.get(txid, set()) & self.transactions.keys()
+
+    def add(self, transaction):
+        txid = transaction["txid"]
+        self.transactions[txid] = transaction
+        self.by_wtxid[transaction["wtxid"]] = transaction
+        for outpoint in transaction["spends"]:
+            self.spenders[outpoint] = transaction["wtxid"]
+            self.spent_by[outpoint[0]].add(txid)
+
+    def remove(self, txid):
+        transaction = self.transactions.pop(txid, None)
+        if transaction is None:
+            return None
+        del self.by_wtxid[transaction["wtxid"]]
+        for outpoint in transaction["spends"]:
+            if self.spenders.get(outpoint) == transaction["wtxid"]:
+                del self.spenders[outpoint]
+            spenders = self.spent_by.get(outpoint[0])
+            if spenders is not None:
+                spenders.discard(txid)
+                if not spenders:
+                    del self.spent_by[outpoint[0]]
+        return transaction
+
+    def remove_with_descendants(self, txid):
+        removed = []
+        pending = [txid]
+        while pending:
+            current = pending.pop()
+            pending.extend(self.children(current))
+            transaction = self.remove(current)
+            if transaction is not None:
+                removed.append(transaction)
+        return removed
+
+    def loses_conflict(self, transaction, conflicting=None):
+        # A conflicting mempool transaction with an equal or higher fee rate
+        # keeps its place.
+        if conflicting is None:
+            conflicting = [self.by_wtxid[w] for w in self.conflicts(transaction)]
+        return any(feerate(other) >= feerate(transaction) for other in conflicting)
+
+    def admit(self, transaction):
+        # Adds a transaction unless it loses a conflict; conflicts it wins
+        # are evicted with their descendants. Returns (added, evicted
+        # transactions).
+        conflicting = [self.by_wtxid[w] for w in self.conflicts(transaction)]
+        if self.loses_conflict(transaction, conflicting):
+            return False, []
+        evicted = []
+        for other in conflicting:
+            evicted.extend(self.remove_with_descendants(other["txid"]))
+        self.add(transaction)
+        return True, evicted
+
+
+@metrics.timed("outpoint_index")
+def build_outpoint_index(transactions):
+    # One pass over the mempool. When two transactions spend the same
+    # outpoint the one with the higher fee rate stays; the other one and
+    # everything descending from it is returned as rejected.
+    index = OutpointIndex()
+    rejected = []
+    evicted = set()
+    for transaction in transactions:
+        if any(txid in evicted for txid, _ in transaction["spends"]):
+            added, removed = False, []
+        else:
+            added, removed = index.admit(transaction)
+        if not added:
+            # Files come in hash order, so children read before this
+            # transaction were taken to spend confirmed outputs.
+            removed = [transaction]
+            for child in list(index.children(transaction["txid"])):
+                removed.extend(index.remove_with_descendants(child))
+        for other in removed:
+            evicted.add(other["txid"])
+            rejected.append(other)
+    metrics.count("conflicts_rejected", len(rejected))
+    return index, rejected
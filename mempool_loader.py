@@ -0,0 +1,140 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import metrics
+from mine.transaction import Transaction
+from transaction_serialization import (
+    hash_stripped,
+    hash_transaction,
+    hash_transactions,
+)
+
+MEMPOOL_DIR = "mempool"
+CHUNK_SIZE = 256
+
+
+def get_fee(transaction):
+    return sum(transaction.input_values) - sum(transaction.output_values)
+
+
+@metrics.timed("serialize")
+def pre_process_transaction(transaction, with_wtxid=False):
+    # Unless asked for, the wtxid is left to transaction_wtxid() so that
+    # ranking by fee rate never decodes a witness stack.
+    if with_wtxid:
+        txid, transaction.wtxid, base_size, witness_size = hash_transaction(transaction)
+    else:
+        txid, base_size = hash_stripped(transaction)
+        witness_size = transaction.witness_size()
+    transaction.txid = txid
+    transaction.weight = base_size * 4 + witness_size
+    transaction.base_size = base_size
+    transaction.fee = get_fee(transaction)
+
+    return transaction
+
+
+@metrics.timed("serialize")
+def pre_process_transactions(transactions, with_wtxid=False):
+    # pre_process_transaction() for a batch, hashing it in one go.
+    hashes = hash_transactions(transactions, with_wtxid)
+    for transaction, (txid, wtxid, base_size, witness_size) in zip(
+        transactions, hashes
+    ):
+        transaction.txid = txid
+        transaction.wtxid = wtxid
+        transaction.weight = base_size * 4 + witness_size
+        transaction.base_size = base_size
+        transaction.fee = get_fee(transaction)
+    return transactions
+
+
+def load_transaction_file(filename, directory=MEMPOOL_DIR):
+    with open(os.path.join(directory, filename), "rb") as file:
+        return Transaction.from_json(json.loads(file.read()))
+
+
+def read_transaction_file(filename, directory=MEMPOOL_DIR, with_wtxid=False):
+    transaction = load_transaction_file(filename, directory)
+    pre_process_transaction(transaction, with_wtxid)
+    return transaction
+
+
+def scan_mempool(directory=MEMPOOL_DIR):
+    with os.scandir(directory) as entries:
+        names = [
+            entry.name
+            for entry in entries
+            if entry.name.endswith(".json") and entry.is_file()
+        ]
+    names.sort()
+    return names
+
+
+def stat_mempool(directory=MEMPOOL_DIR):
+    # (filename, size, mtime_ns) for every transaction file, in filename order.
+    with os.scandir(directory) as entries:
+        stats = []
+        for entry in entries:
+            if entry.name.endswith(".json") and entry.is_file():
+                stat = entry.stat()
+                stats.append((entry.name, stat.st_size, stat.st_mtime_ns))
+    stats.sort()
+    return stats
+
+
+def _read_chunk(directory, filenames, with_wtxid=False):
+    return pre_process_transactions(
+        [load_transaction_file(filename, directory) for filename in filenames],
+        with_wtxid,
+    )
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def iter_mempool(
+    directory=MEMPOOL_DIR,
+    filenames=None,
+    workers=None,
+    chunk_size=CHUNK_SIZE,
+    with_wtxid=False,
+):
+    # Yields preprocessed transactions in filename order. Chunks are parsed
+    # in worker processes; executor.map hands them back in submission order
+    # so the output does not depend on which worker finishes first.
+    if filenames is None:
+        filenames = scan_mempool(directory)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(filenames) <= chunk_size:
+        for chunk in _chunks(filenames, chunk_size):
+            yield from _read_chunk(directory, chunk, with_wtxid)
+        return
+
+    chunks = list(_chunks(filenames, chunk_size))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for transactions in executor.map(
+            _read_chunk,
+            [directory] * len(chunks),
+            chunks,
+            [with_wtxid] * len(chunks),
+        ):
+            yield from transactions
+
+
+def load_mempool(
+    directory=MEMPOOL_DIR, filenames=None, workers=None, chunk_size=CHUNK_SIZE
+):
+    start = time.perf_counter()
+    transactions = list(iter_mempool(directory, filenames, workers, chunk_size))
+    elapsed = time.perf_counter() - start
+    rate = len(transactions) / elapsed if elapsed else 0.0
+    print(
+        f"Loaded {len(transactions)} transactions in {elapsed:.2f}s "
+        f"({rate:.0f} files/sec)"
+    )
+    return transactions
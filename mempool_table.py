@@ -0,0 +1,88 @@
+import numpy as np
+
+import metrics
+from block.calculations import MAX_BLOCK_WEIGHT
+
+FEERATE_PERCENTILES = (10, 25, 50, 75, 90)
+# Fee-rate bands in sat/vB for feerate_histogram(); the last one is open.
+FEERATE_BANDS = (1, 2, 3, 4, 5, 6, 8, 10, 12, 15, 20, 30, 50, 100, 200, 500)
+
+
+def _column(rows, field):
+    return np.fromiter((row[field] for row in rows), np.int64, len(rows))
+
+
+class MempoolTable:
+    # The mempool as columns: one NumPy array per field, one row per
+    # transaction summary in the order given. `rows` leads from a row back
+    # to its summary and `position` from a txid to its row. Totals, fee-rate
+    # order, percentiles and weight cutoffs are then whole-array operations.
+    def __init__(self, summaries):
+        self.rows = list(summaries)
+        self.position = {row["txid"]: i for i, row in enumerate(self.rows)}
+        self.fee = _column(self.rows, "fee")
+        self.input_value = _column(self.rows, "input_value")
+        self.output_value = self.input_value - self.fee
+        self.weight = _column(self.rows, "weight")
+        self.base_size = _column(self.rows, "base_size")
+        self.witness_size = self.weight - 4 * self.base_size
+        self.vsize = (self.weight + 3) // 4
+        self.feerate = self.fee / np.maximum(self.vsize, 1)  # sat/vB
+
+    def __len__(self):
+        return len(self.rows)
+
+    def lookup(self, txids):
+        return np.fromiter((self.position[txid] for txid in txids), np.intp)
+
+    def totals(self, rows=None):
+        # (weight, fee) of the given rows, or of the whole table.
+        if rows is None:
+            return int(self.weight.sum()), int(self.fee.sum())
+        return int(self.weight[rows].sum()), int(self.fee[rows].sum())
+
+    def by_feerate(self):
+        # Rows from the highest fee rate down; ties keep table order.
+        return np.argsort(-self.feerate, kind="stable")
+
+    def cutoff(self, max_weight=MAX_BLOCK_WEIGHT, order=None):
+        # The longest prefix of `order` (by fee rate unless given) whose
+        # cumulative weight stays within max_weight. Parents are not
+        # considered: this bounds a block, it does not build one.
+        if order is None:
+            order = self.by_feerate()
+        fits = np.searchsorted(np.cumsum(self.weight[order]), max_weight, "right")
+        return order[:fits]
+
+    def feerate_percentiles(self, percentiles=FEERATE_PERCENTILES):
+        # Fee rate below which the given percentages of the mempool's
+        # virtual size pay, as {percentile: sat/vB}.
+        if not len(self):
+            return {}
+        order = np.argsort(self.feerate, kind="stable")
+        filled = np.cumsum(self.vsize[order])
+        targets = np.asarray(percentiles) / 100 * filled[-1]
+        picks = np.minimum(np.searchsorted(filled, targets), len(order) - 1)
+        rates = self.feerate[order[picks]]
+        return {p: float(rate) for p, rate in zip(percentiles, rates)}
+
+    def feerate_histogram(self, bands=FEERATE_BANDS):
+        # Virtual size and transaction count per fee-rate band, as
+        # (band floor, vsize, count) with the floor in sat/vB.
+        edges = np.concatenate(([0], bands, [np.inf]))
+        vsize, _ = np.histogram(self.feerate, edges, weights=self.vsize)
+        count, _ = np.histogram(self.feerate, edges)
+        return [
+            (float(floor), int(size), int(n))
+            for floor, size, n in zip(edges[:-1], vsize, count)
+        ]
+
+    def record_metrics(self):
+        metrics.gauge("mempool_transactions", len(self))
+        metrics.gauge("mempool_vsize", int(self.vsize.sum()))
+        metrics.gauge("mempool_fee", int(self.fee.sum()))
+        for percentile, rate in self.feerate_percentiles().items():
+            metrics.gauge(f"mempool_feerate_p{percentile}", rate)
+        block = self.cutoff()
+        if len(block):
+            metrics.gauge("mempool_block_min_feerate", float(self.feerate[block[-1]]))
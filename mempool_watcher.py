@@ -0,0 +1,140 @@
+import time
+
+import metrics
+from mempool_cache import load_snapshot, summarize_transaction
+from mempool_loader import MEMPOOL_DIR, iter_mempool, stat_mempool
+from block.incremental import IncrementalTemplate
+from validations.scheduler import check_transactions, screen_mempool
+
+
+def diff_mempool(previous, stats):
+    # (added, removed) filenames between a {filename: (size, mtime_ns)} map
+    # and a fresh stat_mempool listing. A file that changed in place is
+    # reported as both removed and added.
+    current = {filename: (size, mtime_ns) for filename, size, mtime_ns in stats}
+    added = [name for name, stat in current.items() if previous.get(name) != stat]
+    removed = [name for name, stat in previous.items() if current.get(name) != stat]
+    return current, added, removed
+
+
+class MempoolWatcher:
+    # Polls the mempool directory and keeps an IncrementalTemplate in step
+    # with it. Only files that appeared, vanished or changed since the last
+    # poll are read and verified.
+    def __init__(self, directory=MEMPOOL_DIR, workers=None, verdicts=None):
+        self.directory = directory
+        self.workers = workers
+        self.verdicts = verdicts  # optional VerdictCache
+        self.files = {}
+        self.txids = {}  # filename -> txid of every transaction seen
+        # Transactions that failed validation or lost a conflict. Anything
+        # spending one of them is rejected on arrival.
+        self.rejected = set()
+        # Valid transactions whose parent left the mempool, by txid. They
+        # are admitted again once that parent returns.
+        self.orphans = {}
+        self.template = None
+
+    def start(self):
+        self.files, _, _ = diff_mempool({}, stat_mempool(self.directory))
+        summaries = load_snapshot(self.directory, workers=self.workers)
+        self.txids = {summary["filename"]: summary["txid"] for summary in summaries}
+        index, valid = screen_mempool(
+            summaries, self.directory, self.workers, self.verdicts
+        )
+        self.rejected = set(self.txids.values()) - {tx["txid"] for tx in valid}
+        self.template = IncrementalTemplate(index)
+        return self.template
+
+    def _load(self, filenames):
+        transactions = list(
+            iter_mempool(self.directory, filenames, self.workers, with_wtxid=True)
+        )
+        # Structure and rejected parents are checked before any script runs.
+        summaries = []
+        pending = []
+        for filename, transaction in zip(filenames, transactions):
+            summary = summarize_transaction(transaction, filename)
+            self.txids[filename] = summary["txid"]
+            if summary["policy"] is None and not self._rejected_parent(summary):
+                summaries.append(summary)
+                pending.append(transaction)
+            else:
+                self.rejected.add(summary["txid"])
+        verdicts = check_transactions(pending, self.workers, self.verdicts)
+        accepted = []
+        for summary, (ok, _, _) in zip(summaries, verdicts):
+            parents = [txid for txid, _ in summary["spends"]]
+            if not ok or self._rejected_parent(summary):
+                self.rejected.add(summary["txid"])
+            elif any(txid in self.orphans for txid in parents):
+                self.orphans[summary["txid"]] = summary
+            else:
+                accepted.append(summary)
+        return accepted
+
+    def _rejected_parent(self, summary):
+        return any(txid in self.rejected for txid, _ in summary["spends"])
+
+    def _adopt(self, arrivals):
+        # Orphans spending one of the arrivals, then their orphaned
+        # descendants, parents first.
+        known = {summary["txid"] for summary in arrivals}
+        adopted = []
+        while True:
+            ready = [
+                orphan
+                for orphan in self.orphans.values()
+                if any(txid in known for txid, _ in orphan["spends"])
+            ]
+            if not ready:
+                return adopted
+            for orphan in ready:
+                del self.orphans[orphan["txid"]]
+                known.add(orphan["txid"])
+            adopted.extend(ready)
+
+    @metrics.timed("template_patch")
+    def poll(self):
+        # Applies whatever changed since the last poll. Returns the number
+        # of added and removed files, or None when nothing changed.
+        self.files, added, removed = diff_mempool(
+            self.files, stat_mempool(self.directory)
+        )
+        if not added and not removed:
+            return None
+
+        gone = {self.txids.pop(filename, None) for filename in removed}
+        gone.discard(None)
+        self.rejected -= gone
+        for txid in gone:
+            self.orphans.pop(txid, None)
+        # Descendants of a vanished transaction spend outputs that no longer
+        # exist; they wait as orphans until it comes back.
+        for summary in self.template.remove(
+            [txid for txid in gone if txid in self.template.index]
+        ):
+            if summary["txid"] not in gone:
+                self.orphans[summary["txid"]] = summary
+        if added:
+            arrivals = self._load(added)
+            arrivals += self._adopt(arrivals)
+            for summary in self.template.add(arrivals):
+                self.rejected.add(summary["txid"])
+        return len(added), len(removed)
+
+    def watch(self, interval=1.0):
+        # Yields the template after startup and again after every change.
+        yield self.template or self.start()
+        while True:
+            time.sleep(interval)
+            start = time.perf_counter()
+            change = self.poll()
+            if change is None:
+                continue
+            elapsed = time.perf_counter() - start
+            print(
+                f"Mempool: +{change[0]} -{change[1]} files, "
+                f"{len(self.template)} transactions selected in {elapsed:.3f}s"
+            )
+            yield self.template
@@ -0,0 +1,160 @@
+import functools
+import json
+import os
+import re
+import time
+
+# Stage timers and counters for one process. Everything is a no-op until
+# enable() is called: timer() hands back a shared null context and count()
+# and gauge() return after one flag check, so the instrumented code pays
+# next to nothing in normal runs. Work done in worker processes is only
+# visible through what the parent records about it.
+_enabled = False
+timers = {}  # name -> [calls, total seconds, max seconds]
+counters = {}
+gauges = {}
+
+METRIC_PREFIX = "miner_"
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def enabled():
+    return _enabled
+
+
+def reset():
+    timers.clear()
+    counters.clear()
+    gauges.clear()
+
+
+class _Timer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def record_time(name, seconds):
+    stat = timers.get(name)
+    if stat is None:
+        timers[name] = [1, seconds, seconds]
+    else:
+        stat[0] += 1
+        stat[1] += seconds
+        if seconds > stat[2]:
+            stat[2] = seconds
+
+
+def timer(name):
+    # with timer("selection"): ...
+    return _Timer(name) if _enabled else _NULL_TIMER
+
+
+def timed(name):
+    # Decorator form of timer(); checks the flag on every call so enabling
+    # metrics after import still works.
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record_time(name, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorate
+
+
+def count(name, value=1):
+    if _enabled:
+        counters[name] = counters.get(name, 0) + value
+
+
+def gauge(name, value):
+    if _enabled:
+        gauges[name] = value
+
+
+def summary():
+    return {
+        "timers": {
+            name: {"calls": calls, "seconds": total, "max_seconds": longest}
+            for name, (calls, total, longest) in sorted(timers.items())
+        },
+        "counters": dict(sorted(counters.items())),
+        "gauges": dict(sorted(gauges.items())),
+    }
+
+
+def _metric_name(name):
+    return METRIC_PREFIX + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def prometheus_text():
+    lines = []
+    if timers:
+        for metric, column in (("calls_total", 0), ("seconds_total", 1)):
+            full = f"{METRIC_PREFIX}stage_{metric}"
+            lines.append(f"# TYPE {full} counter")
+            for name, stat in sorted(timers.items()):
+                lines.append(f'{full}{{stage="{name}"}} {stat[column]}')
+        full = f"{METRIC_PREFIX}stage_max_seconds"
+        lines.append(f"# TYPE {full} gauge")
+        for name, stat in sorted(timers.items()):
+            lines.append(f'{full}{{stage="{name}"}} {stat[2]}')
+    for name, value in sorted(counters.items()):
+        full = _metric_name(name) + "_total"
+        lines.append(f"# TYPE {full} counter")
+        lines.append(f"{full} {value}")
+    for name, value in sorted(gauges.items()):
+        full = _metric_name(name)
+        lines.append(f"# TYPE {full} gauge")
+        lines.append(f"{full} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def _write(path, text):
+    with open(path + ".tmp", "w") as file:
+        file.write(text)
+    os.replace(path + ".tmp", path)
+
+
+def dump(directory):
+    # metrics.json and metrics.prom (node_exporter textfile format),
+    # replaced atomically so a scraper never reads half a file.
+    os.makedirs(directory, exist_ok=True)
+    _write(
+        os.path.join(directory, "metrics.json"),
+        json.dumps(summary(), indent=2) + "\n",
+    )
+    _write(os.path.join(directory, "metrics.prom"), prometheus_text())
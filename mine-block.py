@@ -1,20 +1,29 @@
-import json
-import os
-import hashlib
+import argparse
+import asyncio
+import itertools
 import time
 
+import metrics
 from coinbase import serialize_coinbase_transaction
-from utilities import reverse_bytes, hash256
-from transaction_serialization import serialize_transaction
-from txid_serialization_backup import serialize
-from block.calculations import generate_merkle_root, hash256, calculate_total_weight_and_fee
-from block.witness import calculate_witness_commitment, verify_witness_commitment
-from block.header import validate_header
-
-MEMPOOL_DIR = "mempool"
+from mempool_cache import load_snapshot
+from mempool_table import MempoolTable
+from mempool_watcher import MempoolWatcher
+from pipeline import MiningPipeline
+from block.calculations import calculate_total_weight_and_fee, merkle_root_from_branch
+from block.merkle import build_block_trees
+from block.witness import witness_commitment_from_root
+from block.header import DIFFICULTY_TARGET, header_prefix, validate_header
+from block.template import build_block_template
+from block.verify import verify_block_file
+from mine.miner import find_nonce
+from mine.stratum import JobServer
+from validations.policy import Rejections
+from validations.scheduler import RULES_TAG, screen_mempool
+from verdict_cache import VerdictCache
+
 OUTPUT_FILE = "output.txt"
-DIFFICULTY_TARGET = "0000ffff00000000000000000000000000000000000000000000000000000000"
-BLOCK_VERSION = 4
+# Two hours, the furthest into the future a block timestamp may be.
+MAX_TIME_ROLL = 7200
 WITNESS_RESERVED_VALUE_HEX = (
     "0000000000000000000000000000000000000000000000000000000000000000"
 )
@@ -23,134 +32,204 @@ WITNESS_RESERVED_VALUE_BYTES = bytes.fromhex(WITNESS_RESERVED_VALUE_HEX)
 WTXID_COINBASE = bytes(32).hex()
 
 
-def get_fee(transaction):
-    in_value = [int(i["prevout"]["value"]) for i in transaction["vin"]]
-    total_sum_in_value = sum(in_value)
-    out_value = [int(i["value"]) for i in transaction["vout"]]
-    total_sum_out_value = sum(out_value)
-    return total_sum_in_value - total_sum_out_value
-
-
-def pre_process_transaction(transaction):
-
-    global p2pkh, p2wpkh, p2sh
-    transaction["txid"] = reverse_bytes(hash256(serialize(transaction)))
-    transaction["weight"] = 1
-    transaction["wtxid"] = reverse_bytes(hash256(serialize_transaction(transaction)))
-    transaction["fee"] = transaction.get("fee", get_fee(transaction))
-
-    return transaction
-
-
-def read_transaction_file(filename):
-    with open(os.path.join(MEMPOOL_DIR, filename), "r") as file:
-        transaction = json.load(file)
-
-    pre_process_transaction(transaction)
-    return transaction
-
-
-def mine_block(transactions):
-    nonce = 0
+def mine_block(transactions, trees=None, cancel=None):
+    # Returns None if the threading.Event `cancel` is set before a header is
+    # found.
     txids = [tx["txid"] for tx in transactions]
 
-    witness_commitment = calculate_witness_commitment(transactions)
-    print("witneness commitment:", witness_commitment)
-
-    coinbase_hex, coinbase_txid = serialize_coinbase_transaction(
-        witness_commitment=witness_commitment
+    # The watcher hands in trees it keeps up to date itself.
+    txid_tree, wtxid_tree = trees or build_block_trees(
+        [bytes.fromhex(txid)[::-1] for txid in txids],
+        [bytes.fromhex(tx["wtxid"])[::-1] for tx in transactions],
     )
+    witness_commitment = witness_commitment_from_root(wtxid_tree.root())
+    print("witneness commitment:", witness_commitment)
 
-    merkle_root = generate_merkle_root([coinbase_txid] + txids)
+    # The coinbase is leaf 0, so the rest of the tree is fixed for the whole
+    # search and a new extranonce only costs one pass up the cached branch.
+    branch = txid_tree.branch(0)
 
-    block_version_bytes = BLOCK_VERSION.to_bytes(4, "little")
-    prev_block_hash_bytes = bytes.fromhex(
-        "0000000000000000000000000000000000000000000000000000000000000000"
-    )
-    merkle_root_bytes = bytes.fromhex(merkle_root)
-    timestamp_bytes = int(time.time()).to_bytes(4, "little")
-    bits_bytes = (0x1F00FFFF).to_bytes(4, "little")
-    nonce_bytes = nonce.to_bytes(4, "little")
-
-    block_header = (
-        block_version_bytes
-        + prev_block_hash_bytes
-        + merkle_root_bytes
-        + timestamp_bytes
-        + bits_bytes
-        + nonce_bytes
-    )
+    timestamp = int(time.time())
 
     target = int(DIFFICULTY_TARGET, 16)
     print("target:", target)
-    while True:
-        block_hash = hashlib.sha256(hashlib.sha256(block_header).digest()).digest()
-        reversed_hash = block_hash[::-1]
-        if int.from_bytes(reversed_hash, "big") <= target:
-            break
-        nonce += 1
-        nonce_bytes = nonce.to_bytes(4, "little")
-        block_header = block_header[:-4] + nonce_bytes
-        if nonce < 0x0 or nonce > 0xFFFFFFFF:
-            raise ValueError("Invalid nonce")
-
-    block_header_hex = block_header.hex()
+    nonce = None
+    extranonces = itertools.count()
+    pow_started = time.perf_counter()
+    hashes_before = metrics.counters.get("pow_hashes", 0)
+    while nonce is None:
+        extranonce = next(extranonces)
+        coinbase_hex, coinbase_txid = serialize_coinbase_transaction(
+            witness_commitment=witness_commitment, extranonce=extranonce
+        )
+        merkle_root_bytes = merkle_root_from_branch(
+            bytes.fromhex(coinbase_txid)[::-1], branch
+        )
+        # Roll nTime through the allowed future drift before paying for a
+        # new coinbase.
+        for ntime in range(timestamp, timestamp + MAX_TIME_ROLL + 1):
+            prefix = header_prefix(merkle_root_bytes, ntime)
+            metrics.count("pow_headers")
+            nonce = find_nonce(prefix, target, cancel=cancel)
+            if nonce is not None:
+                break
+            if cancel is not None and cancel.is_set():
+                return None
+
+    pow_elapsed = time.perf_counter() - pow_started
+    if metrics.enabled():
+        metrics.record_time("pow", pow_elapsed)
+        hashes = metrics.counters.get("pow_hashes", 0) - hashes_before
+        metrics.gauge("pow_hashes_per_second", hashes / pow_elapsed)
+        metrics.gauge("pow_nonce", nonce)
+        metrics.gauge("pow_extranonce", extranonce)
+        metrics.gauge("pow_ntime_offset", ntime - timestamp)
+
+    block_header_hex = (prefix + nonce.to_bytes(4, "little")).hex()
     validate_header(block_header_hex, DIFFICULTY_TARGET)
 
     return block_header_hex, txids, nonce, coinbase_hex, coinbase_txid
 
 
-def validate_block(coinbase_tx, txids, transactions):
+def write_block(transactions, mempool, trees=None, mined=None):
+    if not any(transactions):
+        raise ValueError("No valid transactions to include in the block")
 
-    mempool_txids = set()
-    for filename in os.listdir(MEMPOOL_DIR):
-        tx_data = read_transaction_file(filename)
-        if "vin" in tx_data and len(tx_data["vin"]) > 0 and "txid" in tx_data["vin"][0]:
-            mempool_txids.add(tx_data["vin"][0]["txid"])
-        else:
-            raise ValueError(f"Transaction file {filename} is missing 'txid' in 'vin'")
+    block_header, txids, nonce, coinbase_tx_hex, coinbase_txid = mined or mine_block(
+        transactions, trees
+    )
 
-    for txid in txids:
-        if txid not in mempool_txids:
-            raise ValueError(f"Invalid txid found in block: {txid}")
+    with open(OUTPUT_FILE, "w") as file:
+        file.write(f"{block_header}\n{coinbase_tx_hex}\n{coinbase_txid}\n")
+        file.writelines(f"{txid}\n" for txid in txids)
 
     total_weight, total_fee = calculate_total_weight_and_fee(transactions)
+    print(f"Total weight: {total_weight}")
+    print(f"Total fee: {total_fee}")
 
-    witness_commitment = calculate_witness_commitment(transactions)
-    if not verify_witness_commitment(coinbase_tx, witness_commitment):
-        raise ValueError("Invalid witness commitment in coinbase transaction")
-
+    # Check what was actually written, against the mempool it came from.
+    start = time.perf_counter()
+    block_weight, block_fee = verify_block_file(OUTPUT_FILE, mempool)
+    elapsed = time.perf_counter() - start
     print(
-        f"Block is valid with a total weight of {total_weight} and a total fee of {total_fee}!"
+        f"Block is valid with a total weight of {block_weight} and a total fee "
+        f"of {block_fee}! (verified in {elapsed:.3f}s)"
     )
 
 
-def main():
-    transactions = []
-
-    with open("valid-mempool.json", "r") as file:
-        unverified_txns = json.load(file)
-
-    for tx in unverified_txns[:2100]:
-        verified_tx = pre_process_transaction(tx)
-        transactions.append(verified_tx)
+def watch(interval, metrics_dir=None):
+    # Long-running mode: mines a new block whenever the mempool changes,
+    # reusing the template and Merkle trees patched by the watcher.
+    verdicts = VerdictCache(RULES_TAG)
+    for template in MempoolWatcher(verdicts=verdicts).watch(interval):
+        transactions, txid_tree, wtxid_tree = template.publish()
+        write_block(transactions, template.index.transactions, (txid_tree, wtxid_tree))
+        if metrics_dir:
+            metrics.dump(metrics_dir)
+
+
+def serve(address, interval=None, metrics_dir=None):
+    # Hands the template out to mine-worker.py clients instead of mining
+    # here and writes the first block they find. With an interval the
+    # mempool is watched as well: every change goes out as a clean job and
+    # every block found is written.
+    asyncio.run(_serve(address, interval, metrics_dir))
+
+
+async def _serve(address, interval, metrics_dir):
+    loop = asyncio.get_running_loop()
+    watcher = MempoolWatcher(verdicts=VerdictCache(RULES_TAG))
+    template = await loop.run_in_executor(None, watcher.start)
+    server = await JobServer(address).start()
+    print(f"Serving jobs on {address}")
+    try:
+        while True:
+            transactions, txid_tree, wtxid_tree = template.publish()
+            server.set_template(transactions, (txid_tree, wtxid_tree))
+            while True:
+                try:
+                    found, mined = await asyncio.wait_for(server.next_block(), interval)
+                except asyncio.TimeoutError:
+                    found = mined = None
+                if mined is not None:
+                    # A block for an older template is checked against the
+                    # transactions it was built from.
+                    mempool = dict(template.index.transactions)
+                    mempool.update((tx["txid"], tx) for tx in found)
+                    write_block(found, mempool, mined=mined)
+                    if metrics_dir:
+                        metrics.dump(metrics_dir)
+                    if interval is None:
+                        return
+                    if mined[1] == [tx["txid"] for tx in transactions]:
+                        # Nothing left to mine until the mempool changes.
+                        server.set_template([])
+                if await loop.run_in_executor(None, watcher.poll) is not None:
+                    break
+    finally:
+        await server.close()
 
-    print(f"Total transactions: {len(transactions)}")
 
-    if not any(transactions):
-        raise ValueError("No valid transactions to include in the block")
-
-    block_header, txids, nonce, coinbase_tx_hex, coinbase_txid = mine_block(
-        transactions
+def main():
+    parser = argparse.ArgumentParser(description="Mine a block from the mempool")
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="keep running and mine again whenever the mempool changes",
     )
+    parser.add_argument(
+        "--interval", type=float, default=1.0, help="seconds between polls"
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="stream the mempool through staged workers and start mining early",
+    )
+    parser.add_argument(
+        "--serve",
+        metavar="ADDRESS",
+        help="hand out jobs to mine-worker.py on host:port or a Unix socket path",
+    )
+    parser.add_argument(
+        "--metrics",
+        metavar="DIR",
+        help="record stage timings and counters and write them to DIR",
+    )
+    args = parser.parse_args()
+    if args.metrics:
+        metrics.enable()
+    if args.serve:
+        serve(args.serve, args.interval if args.watch else None, args.metrics)
+        return
+    if args.watch:
+        watch(args.interval, args.metrics)
+        return
+    if args.pipeline:
+        with VerdictCache(RULES_TAG) as verdicts:
+            pipeline = MiningPipeline(mine_block, verdicts=verdicts)
+            transactions, mined = pipeline.run()
+        pipeline.rejections.report()
+        print(f"Total transactions: {len(transactions)}")
+        write_block(transactions, pipeline.index.transactions, mined=mined)
+        if args.metrics:
+            metrics.dump(args.metrics)
+        return
+
+    unverified_txns = load_snapshot()
+    if args.metrics:
+        MempoolTable(unverified_txns).record_metrics()
+    rejections = Rejections()
+    with VerdictCache(RULES_TAG) as verdicts:
+        mempool, valid = screen_mempool(
+            unverified_txns, cache=verdicts, rejections=rejections
+        )
+    rejections.report()
+    transactions = build_block_template(valid, index=mempool)
 
-    with open(OUTPUT_FILE, "w") as file:
-        file.write(f"{block_header}\n{coinbase_tx_hex}\n{coinbase_txid}\n")
-        file.writelines(f"{txid}\n" for txid in txids)
-
-    total_weight, total_fee = calculate_total_weight_and_fee(transactions)
-    print(f"Total weight: {total_weight}")
-    print(f"Total fee: {total_fee}")
+    print(f"Total transactions: {len(transactions)}")
+    write_block(transactions, {tx["txid"]: tx for tx in unverified_txns})
+    if args.metrics:
+        metrics.dump(args.metrics)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,24 @@
+import argparse
+import asyncio
+
+from mine.stratum import JobWorker
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Mine jobs handed out by mine-block.py --serve"
+    )
+    parser.add_argument("address", help="host:port or Unix socket path of the server")
+    parser.add_argument("--workers", type=int, default=1, help="processes to hash with")
+    args = parser.parse_args()
+
+    worker = JobWorker(args.address, args.workers)
+    try:
+        asyncio.run(worker.run())
+    except (ConnectionError, KeyboardInterrupt):
+        pass
+    print(f"Shares accepted: {worker.accepted}, rejected: {worker.rejected}")
+
+
+if __name__ == "__main__":
+    main()
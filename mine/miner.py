@@ -0,0 +1,140 @@
+import hashlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import metrics
+
+NONCE_LIMIT = 0x100000000
+BATCH_SIZE = 1 << 20
+CANCEL_CHECK_INTERVAL = 1 << 14
+# Seconds between checks of the caller's cancel event while batches run.
+CANCEL_POLL = 0.05
+
+_found = None
+
+
+def _init_worker(found):
+    global _found
+    _found = found
+
+
+def search_nonce_range(header_prefix, start, stop, target, cancel=None):
+    # header_prefix is the first 76 bytes of the header. Its first 64 bytes
+    # fill exactly one SHA-256 block, so that block is compressed once and the
+    # resulting midstate is copied for every nonce.
+    stop_event = cancel if cancel is not None else _found
+    midstate = hashlib.sha256(header_prefix[:64])
+    tail = header_prefix[64:76]
+    sha256 = hashlib.sha256
+    began = time.perf_counter()
+
+    nonce = start
+    while nonce < stop:
+        if stop_event is not None and stop_event.is_set():
+            break
+        chunk_stop = min(nonce + CANCEL_CHECK_INTERVAL, stop)
+        for candidate in range(nonce, chunk_stop):
+            first = midstate.copy()
+            first.update(tail + candidate.to_bytes(4, "little"))
+            digest = sha256(first.digest()).digest()
+            if int.from_bytes(digest, "little") <= target:
+                hashes = candidate - start + 1
+                return candidate, hashes, time.perf_counter() - began, os.getpid()
+        nonce = chunk_stop
+
+    return None, nonce - start, time.perf_counter() - began, os.getpid()
+
+
+def _record(stats, hashes, elapsed, pid):
+    worker = stats.setdefault(pid, [0, 0.0])
+    worker[0] += hashes
+    worker[1] += elapsed
+
+
+def report_hashrate(stats, elapsed):
+    metrics.count("pow_hashes", sum(hashes for hashes, _ in stats.values()))
+    total = 0
+    for pid, (hashes, busy) in sorted(stats.items()):
+        total += hashes
+        rate = hashes / busy if busy else 0.0
+        print(f"worker {pid}: {hashes} hashes, {rate:.0f} H/s")
+    rate = total / elapsed if elapsed else 0.0
+    print(f"total: {total} hashes in {elapsed:.2f}s, {rate:.0f} H/s")
+
+
+def _submit_batch(executor, batches, header_prefix, stop, batch_size, target):
+    batch_start = next(batches, None)
+    if batch_start is None:
+        return None
+    batch_stop = min(batch_start + batch_size, stop)
+    return executor.submit(
+        search_nonce_range, header_prefix, batch_start, batch_stop, target
+    )
+
+
+@metrics.timed("pow_search")
+def find_nonce(
+    header_prefix,
+    target,
+    workers=None,
+    start=0,
+    stop=NONCE_LIMIT,
+    batch_size=None,
+    cancel=None,
+):
+    # Returns a nonce in [start, stop) whose header hash is at
+    # or below `target`, or None when the range is exhausted or the
+    # threading.Event `cancel` is set. Batches of the range are handed to a
+    # process pool; once any worker succeeds the others see the shared
+    # event and stop early.
+    workers = workers or os.cpu_count() or 1
+    batch_size = batch_size or BATCH_SIZE
+    stats = {}
+    began = time.perf_counter()
+
+    if workers == 1:
+        nonce, hashes, elapsed, pid = search_nonce_range(
+            header_prefix, start, stop, target, cancel
+        )
+        _record(stats, hashes, elapsed, pid)
+        report_hashrate(stats, time.perf_counter() - began)
+        return nonce
+
+    found = multiprocessing.Event()
+    batches = iter(range(start, stop, batch_size))
+    solution = None
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(found,)
+    ) as executor:
+        # Keep two batches queued per worker so none of them idles.
+        pending = set()
+        for _ in range(workers * 2):
+            future = _submit_batch(
+                executor, batches, header_prefix, stop, batch_size, target
+            )
+            if future is not None:
+                pending.add(future)
+
+        while pending:
+            done, pending = wait(
+                pending, timeout=CANCEL_POLL, return_when=FIRST_COMPLETED
+            )
+            if cancel is not None and cancel.is_set():
+                found.set()
+            for future in done:
+                nonce, hashes, elapsed, pid = future.result()
+                _record(stats, hashes, elapsed, pid)
+                if nonce is not None and (solution is None or nonce < solution):
+                    solution = nonce
+                    found.set()
+                if not found.is_set():
+                    future = _submit_batch(
+                        executor, batches, header_prefix, stop, batch_size, target
+                    )
+                    if future is not None:
+                        pending.add(future)
+
+    report_hashrate(stats, time.perf_counter() - began)
+    return solution
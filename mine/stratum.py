@@ -0,0 +1,285 @@
+import asyncio
+import itertools
+import json
+import threading
+import time
+
+import metrics
+from coinbase import EXTRANONCE_SIZE, serialize_coinbase_transaction, split_coinbase
+from block.calculations import merkle_root_from_branch
+from block.header import (
+    BLOCK_BITS,
+    BLOCK_VERSION,
+    DIFFICULTY_TARGET,
+    header_prefix,
+    validate_header,
+)
+from block.merkle import build_block_trees
+from block.witness import witness_commitment_from_root
+from mine.miner import find_nonce
+from utilities import hash256_many
+
+# Each worker owns the extranonces whose high 4 bytes are its prefix and
+# rolls the low 4 bytes itself, so no two workers ever hash the same header.
+EXTRANONCE2_SIZE = 4
+EXTRANONCE2_LIMIT = 1 << (8 * EXTRANONCE2_SIZE)
+
+
+def parse_address(address):
+    # "host:port" for TCP, anything else is a Unix socket path.
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit():
+        return host or "127.0.0.1", int(port)
+    return address, None
+
+
+def _send(writer, message):
+    writer.write(json.dumps(message).encode() + b"\n")
+
+
+def coinbase_txid(job, extranonce):
+    # Internal byte order, ready to be a Merkle leaf.
+    return hash256_many(
+        [
+            bytes.fromhex(job["coinb1"])
+            + extranonce.to_bytes(EXTRANONCE_SIZE, "little")
+            + bytes.fromhex(job["coinb2"])
+        ]
+    )
+
+
+def job_header_prefix(job, extranonce):
+    branch = [bytes.fromhex(node) for node in job["branch"]]
+    merkle_root = merkle_root_from_branch(coinbase_txid(job, extranonce), branch)
+    return header_prefix(merkle_root, job["ntime"], job["version"], job["bits"])
+
+
+class JobServer:
+    # Stratum-like work distribution: newline-delimited JSON over TCP or a
+    # Unix socket. A worker sends "subscribe" and gets its extranonce prefix,
+    # then a "notify" with the current job and again whenever the template
+    # changes ("clean": earlier jobs are void). Shares come back as
+    # "submit" and are rebuilt and checked with validate_header; one that
+    # also meets the block target is queued for next_block().
+    def __init__(self, address, share_target=DIFFICULTY_TARGET):
+        self.address = address
+        self.share_target = share_target
+        self.server = None
+        self.clients = {}  # writer -> extranonce prefix
+        self.handlers = set()
+        self.prefixes = itertools.count()
+        self.job_ids = itertools.count()
+        self.job = None
+        self.template = None  # (transactions, witness commitment) behind self.job
+        self.seen = set()  # shares already accepted for the current job
+        self.blocks = asyncio.Queue()
+
+    async def start(self):
+        host, port = parse_address(self.address)
+        if port is None:
+            self.server = await asyncio.start_unix_server(self._serve, host)
+        else:
+            self.server = await asyncio.start_server(self._serve, host, port)
+        return self
+
+    async def close(self):
+        self.server.close()
+        for writer in list(self.clients):
+            writer.close()
+        # Each handler sees end of stream and returns.
+        await asyncio.gather(*self.handlers, return_exceptions=True)
+        await self.server.wait_closed()
+
+    def set_template(self, transactions, trees=None, ntime=None):
+        # Broadcasts a clean job for a new template; no transactions leaves
+        # the workers idle. Shares for the old template are void from now
+        # on, but blocks already found for it stay queued: they are valid.
+        self.seen.clear()
+        if not transactions:
+            self.job, self.template = None, None
+            self._broadcast()
+            return None
+        # A copy: the caller may patch its list in place for the next one.
+        transactions = list(transactions)
+        txids = [tx["txid"] for tx in transactions]
+        txid_tree, wtxid_tree = trees or build_block_trees(
+            [bytes.fromhex(txid)[::-1] for txid in txids],
+            [bytes.fromhex(tx["wtxid"])[::-1] for tx in transactions],
+        )
+        commitment = witness_commitment_from_root(wtxid_tree.root())
+        coinb1, coinb2 = split_coinbase(commitment)
+        self.job = {
+            "job_id": str(next(self.job_ids)),
+            "version": BLOCK_VERSION,
+            "coinb1": coinb1.hex(),
+            "coinb2": coinb2.hex(),
+            "branch": [node.hex() for node in txid_tree.branch(0)],
+            "ntime": ntime or int(time.time()),
+            "bits": BLOCK_BITS,
+            "target": self.share_target,
+            "clean": True,
+        }
+        self.template = (transactions, commitment)
+        self._broadcast()
+        metrics.count("stratum_jobs")
+        return self.job
+
+    def _broadcast(self):
+        for writer in self.clients:
+            _send(writer, {"id": None, "method": "notify", "params": self.job})
+
+    async def next_block(self):
+        # (template transactions, block) with the block as the (header hex,
+        # txids, nonce, coinbase hex, coinbase txid) tuple mine_block
+        # returns. The template may be older than the current one.
+        return await self.blocks.get()
+
+    async def _serve(self, reader, writer):
+        self.handlers.add(asyncio.current_task())
+        try:
+            while line := await reader.readline():
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    message = None
+                if not isinstance(message, dict):
+                    _send(writer, {"id": None, "error": "bad-message"})
+                    await writer.drain()
+                    continue
+                method = message.get("method")
+                if method == "subscribe":
+                    prefix = next(self.prefixes)
+                    self.clients[writer] = prefix
+                    result = {
+                        "extranonce1": prefix,
+                        "extranonce2_size": EXTRANONCE2_SIZE,
+                    }
+                    _send(writer, {"id": message.get("id"), "result": result})
+                    _send(writer, {"id": None, "method": "notify", "params": self.job})
+                elif method == "submit" and writer in self.clients:
+                    params = message.get("params")
+                    if isinstance(params, dict):
+                        error = self._submit(self.clients[writer], params)
+                    else:
+                        error = "bad-params"
+                    reply = {"id": message.get("id"), "result": error is None}
+                    _send(writer, dict(reply, error=error))
+                else:
+                    _send(writer, {"id": message.get("id"), "error": "unknown-method"})
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.pop(writer, None)
+            self.handlers.discard(asyncio.current_task())
+            writer.close()
+
+    def _submit(self, prefix, params):
+        # Returns None for an accepted share, otherwise the reject reason.
+        job = self.job
+        if job is None or params.get("job_id") != job["job_id"]:
+            metrics.count("stratum_shares_stale")
+            return "stale-job"
+        extranonce2, nonce = params.get("extranonce2"), params.get("nonce")
+        if extranonce2.__class__ is not int or nonce.__class__ is not int:
+            metrics.count("stratum_shares_rejected")
+            return "bad-params"
+        if not 0 <= extranonce2 < EXTRANONCE2_LIMIT or not 0 <= nonce < 1 << 32:
+            metrics.count("stratum_shares_rejected")
+            return "out-of-range"
+        if (prefix, extranonce2, nonce) in self.seen:
+            metrics.count("stratum_shares_rejected")
+            return "duplicate"
+        extranonce = prefix << (8 * EXTRANONCE2_SIZE) | extranonce2
+        header = job_header_prefix(job, extranonce) + nonce.to_bytes(4, "little")
+        try:
+            validate_header(header.hex(), self.share_target)
+        except ValueError:
+            metrics.count("stratum_shares_rejected")
+            return "low-difficulty"
+        self.seen.add((prefix, extranonce2, nonce))
+        metrics.count("stratum_shares_accepted")
+        try:
+            validate_header(header.hex(), DIFFICULTY_TARGET)
+        except ValueError:
+            return None
+        transactions, commitment = self.template
+        txids = [tx["txid"] for tx in transactions]
+        coinbase_hex, txid = serialize_coinbase_transaction(commitment, extranonce)
+        block = (header.hex(), txids, nonce, coinbase_hex, txid)
+        self.blocks.put_nowait((transactions, block))
+        return None
+
+
+class JobWorker:
+    # Client side of JobServer: mines the current job on a thread, rolling
+    # its own extranonces, and drops the search as soon as a clean job or
+    # an idle notice arrives.
+    def __init__(self, address, workers=1):
+        self.address = address
+        self.workers = workers
+        self.job = None
+        self.changed = asyncio.Event()
+        self.cancel = threading.Event()
+        self.request_ids = itertools.count(1)
+        self.accepted = 0
+        self.rejected = 0
+
+    async def run(self):
+        host, port = parse_address(self.address)
+        if port is None:
+            reader, self.writer = await asyncio.open_unix_connection(host)
+        else:
+            reader, self.writer = await asyncio.open_connection(host, port)
+        _send(self.writer, {"id": next(self.request_ids), "method": "subscribe"})
+        miner = asyncio.ensure_future(self._mine())
+        try:
+            while line := await reader.readline():
+                self._receive(json.loads(line))
+        finally:
+            self.cancel.set()
+            miner.cancel()
+            self.writer.close()
+
+    def _receive(self, message):
+        if isinstance(message.get("result"), dict):
+            self.prefix = message["result"]["extranonce1"]
+        elif message.get("method") == "notify":
+            self.job = message["params"]
+            self.cancel.set()
+            self.changed.set()
+        elif message.get("result") is True:
+            self.accepted += 1
+            print(f"share accepted ({self.accepted} so far)")
+        elif message.get("error"):
+            self.rejected += 1
+            print(f"share rejected: {message['error']}")
+
+    async def _mine(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.changed.wait()
+            self.changed.clear()
+            job, self.cancel = self.job, threading.Event()
+            if job is not None:
+                await loop.run_in_executor(None, self._search, loop, job, self.cancel)
+
+    def _search(self, loop, job, cancel):
+        # Rolls this worker's extranonces until the job is replaced; every
+        # share found is handed to the event loop to send.
+        target = int(job["target"], 16)
+        base = self.prefix << (8 * EXTRANONCE2_SIZE)
+        for extranonce2 in range(EXTRANONCE2_LIMIT):
+            prefix = job_header_prefix(job, base | extranonce2)
+            nonce = find_nonce(prefix, target, self.workers, cancel=cancel)
+            if cancel.is_set():
+                return
+            if nonce is not None:
+                loop.call_soon_threadsafe(
+                    self._submit, job["job_id"], extranonce2, nonce
+                )
+
+    def _submit(self, job_id, extranonce2, nonce):
+        params = {"job_id": job_id, "extranonce2": extranonce2, "nonce": nonce}
+        message = {"id": next(self.request_ids), "method": "submit"}
+        _send(self.writer, dict(message, params=params))
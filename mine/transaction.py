@@ -1,10 +1,185 @@
+import sys
+from array import array
+
+
+def _compact_size_length(value):
+    if value < 0xFD:
+        return 1
+    if value <= 0xFFFF:
+        return 3
+    return 5 if value <= 0xFFFFFFFF else 9
+
+
+class TxIn:
+    # Scripts and witness items may be handed in as the hex strings from the
+    # mempool JSON. They are decoded the first time something reads them and
+    # the bytes replace the hex, so fee and weight work never pays for
+    # fields only validation looks at.
+    __slots__ = (
+        "txid",
+        "vout",
+        "_scriptsig",
+        "_witness",
+        "_prevout_script",
+        "prevout_type",
+    )
+
+    def __init__(self, txid, vout, scriptsig, witness, prevout_script, prevout_type):
+        # txid is the spent transaction's id in internal byte order.
+        self.txid = txid
+        self.vout = vout
+        self._scriptsig = scriptsig
+        self._witness = witness
+        self._prevout_script = prevout_script
+        self.prevout_type = prevout_type
+
+    @property
+    def scriptsig(self):
+        if self._scriptsig.__class__ is str:
+            self._scriptsig = bytes.fromhex(self._scriptsig)
+        return self._scriptsig
+
+    @property
+    def prevout_script(self):
+        if self._prevout_script.__class__ is str:
+            self._prevout_script = bytes.fromhex(self._prevout_script)
+        return self._prevout_script
+
+    @property
+    def witness(self):
+        # A list holds undecoded hex items, a tuple decoded bytes.
+        if self._witness.__class__ is list:
+            self._witness = tuple(bytes.fromhex(item) for item in self._witness)
+        return self._witness
+
+    @witness.setter
+    def witness(self, items):
+        self._witness = items
+
+    def scriptsig_size(self):
+        if self._scriptsig.__class__ is str:
+            return len(self._scriptsig) // 2
+        return len(self._scriptsig)
+
+    def witness_size(self):
+        # Serialized size of the witness stack, without decoding it.
+        items = self._witness
+        half = 2 if items.__class__ is list else 1
+        size = _compact_size_length(len(items))
+        for item in items:
+            length = len(item) // half
+            size += _compact_size_length(length) + length
+        return size
+
+
+class TxOut:
+    __slots__ = ("_scriptpubkey", "scriptpubkey_type")
+
+    def __init__(self, scriptpubkey, scriptpubkey_type):
+        self._scriptpubkey = scriptpubkey
+        self.scriptpubkey_type = scriptpubkey_type
+
+    @property
+    def scriptpubkey(self):
+        if self._scriptpubkey.__class__ is str:
+            self._scriptpubkey = bytes.fromhex(self._scriptpubkey)
+        return self._scriptpubkey
+
+
 class Transaction:
-    def __init__(self, tx_data):
-        self.tx = tx_data
-        self.locktime = self.tx.get("locktime")
-        self.version = self.tx.get("version")
-        self.vin = self.tx.get("vin")
-        self.vout = self.tx.get("vout")
-
-    def is_valid_transaction(self):
-        pass
+    # Mempool transaction with scripts, witnesses and hashes as bytes.
+    # Amounts and sequences live in arrays on the transaction rather than on
+    # each TxIn/TxOut, so fee sums never touch the per-input objects.
+    __slots__ = (
+        "version",
+        "locktime",
+        "vin",
+        "vout",
+        "input_values",
+        "output_values",
+        "sequences",
+        "txid",
+        "wtxid",
+        "weight",
+        "base_size",
+        "fee",
+    )
+
+    def __init__(
+        self, version, locktime, vin, vout, input_values, output_values, sequences
+    ):
+        self.version = version
+        self.locktime = locktime
+        self.vin = vin
+        self.vout = vout
+        self.input_values = input_values
+        self.output_values = output_values
+        self.sequences = sequences
+        self.txid = None
+        self.wtxid = None
+        self.weight = None
+        self.base_size = None
+        self.fee = None
+
+    @classmethod
+    def from_json(cls, tx_data):
+        vin = []
+        input_values = array("q")
+        sequences = array("I")
+        for input_data in tx_data["vin"]:
+            prevout = input_data["prevout"]
+            vin.append(
+                TxIn(
+                    bytes.fromhex(input_data["txid"])[::-1],
+                    input_data["vout"],
+                    input_data["scriptsig"],
+                    input_data.get("witness") or [],
+                    prevout["scriptpubkey"],
+                    sys.intern(prevout["scriptpubkey_type"]),
+                )
+            )
+            input_values.append(prevout["value"])
+            sequences.append(input_data["sequence"])
+
+        vout = []
+        output_values = array("q")
+        for output in tx_data["vout"]:
+            vout.append(
+                TxOut(
+                    output["scriptpubkey"],
+                    sys.intern(output["scriptpubkey_type"]),
+                )
+            )
+            output_values.append(output["value"])
+
+        return cls(
+            tx_data["version"],
+            tx_data["locktime"],
+            vin,
+            vout,
+            input_values,
+            output_values,
+            sequences,
+        )
+
+    def has_witness(self):
+        return any(input_data._witness for input_data in self.vin)
+
+    def witness_size(self):
+        # Bytes the BIP144 encoding adds to the stripped one: marker, flag
+        # and every input's witness stack. Works on undecoded hex.
+        if not self.has_witness():
+            return 0
+        return 2 + sum(input_data.witness_size() for input_data in self.vin)
+
+    @property
+    def txid_hex(self):
+        return self.txid[::-1].hex()
+
+    @property
+    def wtxid_hex(self):
+        return self.wtxid[::-1].hex()
+
+    def spends(self):
+        # Spent outpoints as (display-order txid, vout).
+        return [(i.txid[::-1].hex(), i.vout) for i in self.vin]
@@ -0,0 +1,288 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import metrics
+from mempool_cache import summarize_transaction
+from mempool_index import OutpointIndex
+from mempool_loader import (
+    CHUNK_SIZE,
+    MEMPOOL_DIR,
+    load_transaction_file,
+    pre_process_transactions,
+    scan_mempool,
+)
+from block.template import build_block_template
+from validations.policy import STAGES, Rejections
+from validations.scheduler import verify_signatures
+
+# Chunks a queue holds before the stage feeding it has to wait. With
+# CHUNK_SIZE and the number of workers this bounds how many full
+# transactions are in memory at once.
+QUEUE_DEPTH = 2
+# Least number of seconds between provisional templates. Each one costs a
+# selection pass and restarts the proof of work.
+PROVISIONAL_INTERVAL = 1.0
+
+_DONE = None  # end of stream
+
+
+def _parse_chunk(directory, filenames):
+    return [load_transaction_file(filename, directory) for filename in filenames]
+
+
+def _preprocess_chunk(transactions):
+    return pre_process_transactions(transactions, with_wtxid=True)
+
+
+def _verify_chunk(transactions):
+    return verify_signatures(transactions, workers=1)
+
+
+def _inherited(rejected, summary):
+    # (stage, reason) for a child of a rejected transaction, or None. The
+    # child goes at its parent's stage, as in the batch path: descendants
+    # of a conflict loser lose the conflict too.
+    for parent, _ in summary["spends"]:
+        stage = rejected.get(parent)
+        if stage is not None:
+            reason = "outpoint-conflict" if stage == "conflict" else "invalid-ancestor"
+            return stage, reason
+    return None
+
+
+class MiningPipeline:
+    # scan -> parse -> preprocess -> validate -> select -> mine as asyncio
+    # tasks joined by bounded queues. Files are read on threads, hashing and
+    # signature checks run in a worker pool and the proof of work on a
+    # thread of its own. Selection publishes a provisional template each
+    # time it catches up with validation, so mining starts long before the
+    # last file is parsed; a newer template cancels the search in progress
+    # and only a header for the final template is returned.
+    def __init__(
+        self,
+        mine,
+        directory=MEMPOOL_DIR,
+        workers=None,
+        verdicts=None,
+        chunk_size=CHUNK_SIZE,
+    ):
+        # mine(transactions, cancel=event) returns a mined block, or None
+        # once the event is set.
+        self.mine = mine
+        self.directory = directory
+        self.workers = workers or os.cpu_count() or 1
+        self.verdicts = verdicts  # optional VerdictCache
+        self.chunk_size = chunk_size
+        self.index = OutpointIndex()
+        # Transactions that failed validation or lost a conflict, with the
+        # stage that turned them away. Anything spending one of them is
+        # rejected on arrival, at the same stage.
+        self.rejected = {}
+        self.template = None  # (transactions, final)
+        self.rejections = Rejections()
+
+    def run(self):
+        # Returns the final template and the block mined from it.
+        with metrics.timer("pipeline"):
+            return asyncio.run(self._run())
+
+    async def _run(self):
+        self.loop = asyncio.get_running_loop()
+        self.started = time.perf_counter()
+        self.last_published = float("-inf")
+        self.published = asyncio.Event()
+        self.cancel = threading.Event()
+        if self.workers > 1:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=1)
+        queues = [asyncio.Queue(QUEUE_DEPTH) for _ in range(4)]
+        miner = asyncio.ensure_future(self._mine())
+        try:
+            with self.executor:
+                await asyncio.gather(
+                    self._scan(queues[0]),
+                    self._stage(queues[0], queues[1], self._parse),
+                    self._stage(queues[1], queues[2], self._preprocess, self.workers),
+                    self._stage(queues[2], queues[3], self._validate, self.workers),
+                    self._select(queues[3]),
+                )
+            return await miner
+        finally:
+            self.cancel.set()
+            miner.cancel()
+
+    async def _scan(self, outbox):
+        filenames = await self.loop.run_in_executor(None, scan_mempool, self.directory)
+        for start in range(0, len(filenames), self.chunk_size):
+            await outbox.put(filenames[start : start + self.chunk_size])
+        await outbox.put(_DONE)
+
+    async def _stage(self, inbox, outbox, work, width=1):
+        # Runs the coroutine work(chunk) for every chunk with up to `width`
+        # of them in flight, passing results on in arrival order.
+        pending = deque()
+        while (chunk := await inbox.get()) is not _DONE:
+            pending.append(asyncio.ensure_future(work(chunk)))
+            if len(pending) >= width:
+                await outbox.put(await pending.popleft())
+        while pending:
+            await outbox.put(await pending.popleft())
+        await outbox.put(_DONE)
+
+    async def _parse(self, filenames):
+        transactions = await self.loop.run_in_executor(
+            None, _parse_chunk, self.directory, filenames
+        )
+        return filenames, transactions
+
+    async def _preprocess(self, chunk):
+        filenames, transactions = chunk
+        transactions = await self.loop.run_in_executor(
+            self.executor, _preprocess_chunk, transactions
+        )
+        return filenames, transactions
+
+    async def _validate(self, chunk):
+        # (summary, stage, reason) per transaction, with stage and reason
+        # None when it passed. Stages run in the order of STAGES: structure
+        # failures and children of rejected transactions are settled first,
+        # then anything losing an outpoint conflict to the current index, and
+        # only what is left reaches the script checks. Script verdicts come
+        # from the cache where it has them; the rest are verified in the
+        # pool. The cache and the index are only touched from the event loop
+        # thread.
+        filenames, transactions = chunk
+        summaries = [
+            summarize_transaction(transaction, filename)
+            for filename, transaction in zip(filenames, transactions)
+        ]
+        outcomes = []
+        failed = dict(self.rejected)
+        for summary in summaries:
+            if summary["policy"]:
+                outcome = ("structure", summary["policy"])
+            elif inherited := _inherited(failed, summary):
+                outcome = inherited
+            elif self.index.loses_conflict(summary):
+                outcome = ("conflict", "outpoint-conflict")
+            else:
+                outcome = (None, None)
+            if outcome[0] is not None:
+                failed[summary["txid"]] = outcome[0]
+            outcomes.append(outcome)
+        checked = [i for i, (stage, _) in enumerate(outcomes) if stage is None]
+        wtxids = [summaries[i]["wtxid"] for i in checked]
+        verdicts = self.verdicts.get_many(wtxids) if self.verdicts is not None else {}
+        missing = [i for i in checked if summaries[i]["wtxid"] not in verdicts]
+        if missing:
+            fresh = await self.loop.run_in_executor(
+                self.executor, _verify_chunk, [transactions[i] for i in missing]
+            )
+            fresh = [
+                (summaries[i]["wtxid"], verdict) for i, verdict in zip(missing, fresh)
+            ]
+            if self.verdicts is not None:
+                self.verdicts.put_many(fresh)
+            verdicts.update(fresh)
+        for i in checked:
+            reason = verdicts[summaries[i]["wtxid"]][1]
+            if reason is not None:
+                outcomes[i] = ("script", reason)
+        return [(summary, *outcome) for summary, outcome in zip(summaries, outcomes)]
+
+    async def _select(self, inbox):
+        while (chunk := await inbox.get()) is not _DONE:
+            for summary, stage, reason in chunk:
+                self._admit(summary, stage, reason)
+            due = self.last_published + PROVISIONAL_INTERVAL
+            if inbox.empty() and time.perf_counter() >= due:
+                # Caught up with validation: give the miner something better.
+                self._publish(final=False)
+        self._publish(final=True)
+
+    def _admit(self, summary, stage, reason):
+        txid = summary["txid"]
+        if stage is None and (inherited := _inherited(self.rejected, summary)):
+            # The parent was turned away after this chunk was validated.
+            stage, reason = inherited
+        self.rejections.enter("structure", 1)
+        if stage != "structure":
+            self.rejections.enter("conflict", 1)
+            if stage != "conflict":
+                self.rejections.enter("script", 1)
+            if stage is None:
+                added, evicted = self.index.admit(summary)
+                for other in evicted:
+                    self._reject(other, "conflict", "outpoint-conflict")
+                if added:
+                    return
+                # Only when a conflicting transaction was admitted while
+                # this chunk was being validated.
+                stage, reason = "conflict", "outpoint-conflict"
+        self._reject(summary, stage, reason)
+        # Children read before this transaction were taken to spend
+        # confirmed outputs; they go now, with their descendants.
+        for child in list(self.index.children(txid)):
+            for other in self.index.remove_with_descendants(child):
+                stage, reason = _inherited(self.rejected, other)
+                # Admission counted it into every stage; the batch path
+                # stops it where its parent stopped.
+                for later in STAGES[STAGES.index(stage) + 1 :]:
+                    self.rejections.enter(later, -1)
+                self._reject(other, stage, reason)
+
+    def _reject(self, summary, stage, reason):
+        self.rejected[summary["txid"]] = stage
+        self.rejections.reject(stage, reason, summary)
+
+    def _publish(self, final):
+        transactions = build_block_template(
+            list(self.index.transactions.values()), index=self.index
+        )
+        self.template = (transactions, final)
+        self.last_published = time.perf_counter()
+        self.published.set()
+        metrics.count("pipeline_templates")
+
+    async def _mine(self):
+        # Always works on the newest template. A template with the same
+        # transactions as the block already mined is not mined again.
+        mined_txids, mined = None, None
+        with ThreadPoolExecutor(max_workers=1) as thread:
+            while True:
+                await self.published.wait()
+                self.published.clear()
+                transactions, final = self.template
+                txids = [transaction["txid"] for transaction in transactions]
+                if txids != mined_txids and transactions:
+                    block = await self._search(thread, transactions)
+                    if block is not None:
+                        mined_txids, mined = txids, block
+                        self._first_header()
+                if final and (txids == mined_txids or not transactions):
+                    return transactions, mined if transactions else None
+
+    async def _search(self, thread, transactions):
+        # Mines until a header is found or a newer template is published.
+        self.cancel = threading.Event()
+        search = self.loop.run_in_executor(
+            thread, lambda: self.mine(transactions, cancel=self.cancel)
+        )
+        newer = asyncio.ensure_future(self.published.wait())
+        await asyncio.wait({search, newer}, return_when=asyncio.FIRST_COMPLETED)
+        newer.cancel()
+        if not search.done():
+            self.cancel.set()
+            metrics.count("pipeline_restarts")
+        return await search
+
+    def _first_header(self):
+        if "pipeline_first_header_seconds" not in metrics.gauges:
+            metrics.gauge(
+                "pipeline_first_header_seconds", time.perf_counter() - self.started
+            )
@@ -1,4 +1,5 @@
 # pip install coincurve
+# pip install numpy
 # pip install hashlib
 
 python mine-block.py
@@ -1,4 +1,4 @@
-import hashlib
+from block.calculations import generate_merkle_root
 from utilities import hash256
 
 WITNESS_RESERVED_VALUE_HEX = (
@@ -6,24 +6,6 @@ WITNESS_RESERVED_VALUE_HEX = (
 )
 
 
-def generate_merkle_root(txids):
-    if len(txids) == 0:
-        return None
-
-    level = [bytes.fromhex(txid)[::-1].hex() for txid in txids]
-
-    while len(level) > 1:
-        next_level = []
-        for i in range(0, len(level), 2):
-            if i + 1 == len(level):
-                pair_hash = hash256(level[i] + level[i])
-            else:
-                pair_hash = hash256(level[i] + level[i + 1])
-            next_level.append(pair_hash)
-        level = next_level
-    return level[0]
-
-
 def calculate_witness_commitment(wtxids):
 
     witness_root = generate_merkle_root(wtxids)
@@ -0,0 +1,36 @@
+from block.incremental import IncrementalTemplate
+from mempool_index import OutpointIndex
+
+
+def summary(name, spends, fee):
+    return {
+        "txid": name * 64,
+        "wtxid": name * 63 + "f",
+        "spends": [(parent * 64, 0) for parent in spends],
+        "fee": fee,
+        "weight": 400,
+    }
+
+
+def selected(template):
+    return [tx["txid"][0] for tx in template.selected]
+
+
+def test_child_arriving_before_parent_follows_it():
+    template = IncrementalTemplate(OutpointIndex())
+    template.add([summary("c", "b", 500), summary("d", "c", 900)])
+    template.add([summary("a", "e", 50)])
+    template.add([summary("b", "e", 100)])
+    order = selected(template)
+    assert order.index("b") < order.index("c") < order.index("d")
+
+
+def test_parent_stays_evictable_after_failed_room_search():
+    template = IncrementalTemplate(OutpointIndex(), max_weight=800)
+    template.add([summary("a", "7", 400), summary("b", "8", 4000)])
+    # c only fits by evicting its own parent a, so it stays out.
+    template.add([summary("c", "a", 800)])
+    assert sorted(selected(template)) == ["a", "b"]
+    # a is still a leaf the next candidate can push out.
+    template.add([summary("d", "9", 1200)])
+    assert sorted(selected(template)) == ["b", "d"]
@@ -0,0 +1,49 @@
+from mempool_index import build_outpoint_index
+
+
+def summary(txid, spends, fee):
+    return {
+        "txid": txid,
+        "wtxid": txid + "-w",
+        "spends": spends,
+        "fee": fee,
+        "weight": 400,
+    }
+
+
+def test_child_read_before_conflict_loser():
+    index, rejected = build_outpoint_index(
+        [
+            summary("c", [("b", 0)], 500),
+            summary("a", [("x", 0)], 1000),
+            summary("b", [("x", 0)], 100),
+        ]
+    )
+    assert sorted(index.transactions) == ["a"]
+    assert sorted(tx["txid"] for tx in rejected) == ["b", "c"]
+
+
+def test_child_read_before_descendant_of_evicted():
+    # x evicts a; b spends a and is rejected on arrival, taking c with it.
+    index, rejected = build_outpoint_index(
+        [
+            summary("c", [("b", 0)], 500),
+            summary("x", [("y", 0)], 1000),
+            summary("a", [("y", 0)], 100),
+            summary("b", [("a", 0)], 500),
+        ]
+    )
+    assert sorted(index.transactions) == ["x"]
+    assert sorted(tx["txid"] for tx in rejected) == ["a", "b", "c"]
+
+
+def test_winner_evicts_descendants():
+    index, rejected = build_outpoint_index(
+        [
+            summary("a", [("y", 0)], 100),
+            summary("b", [("a", 0)], 500),
+            summary("x", [("y", 0)], 1000),
+        ]
+    )
+    assert sorted(index.transactions) == ["x"]
+    assert sorted(tx["txid"] for tx in rejected) == ["a", "b"]
@@ -0,0 +1,70 @@
+from validations.policy import Rejections
+from validations.scheduler import screen_mempool
+
+
+class Verdicts:
+    # VerdictCache stand-in that already knows every verdict.
+    def __init__(self, verdicts):
+        self.verdicts = verdicts
+
+    def get_many(self, wtxids):
+        return {w: self.verdicts[w] for w in wtxids if w in self.verdicts}
+
+    def put_many(self, verdicts):
+        pass
+
+
+def summary(txid, spends, fee):
+    return {
+        "txid": txid,
+        "wtxid": txid + "-w",
+        "spends": spends,
+        "fee": fee,
+        "weight": 400,
+        "policy": None,
+        "filename": txid + ".json",
+    }
+
+
+VALID = (True, None, 1)
+BAD = (False, "bad-signature", 0)
+
+
+def screen(summaries, verdicts):
+    rejections = Rejections()
+    cache = Verdicts({s["wtxid"]: verdicts.get(s["txid"], VALID) for s in summaries})
+    index, valid = screen_mempool(summaries, cache=cache, rejections=rejections)
+    return sorted(s["txid"] for s in valid), rejections
+
+
+def test_invalid_double_spend_does_not_evict_valid_one():
+    valid, rejections = screen(
+        [summary("a", [("x", 0)], 100), summary("b", [("x", 0)], 1000)],
+        {"b": BAD},
+    )
+    assert valid == ["a"]
+    assert rejections.reasons == {("script", "bad-signature"): 1}
+
+
+def test_double_spend_with_invalid_parent_does_not_evict_valid_one():
+    valid, rejections = screen(
+        [
+            summary("p", [("y", 0)], 100),
+            summary("b", [("p", 0), ("x", 0)], 1000),
+            summary("a", [("x", 0)], 100),
+        ],
+        {"p": BAD},
+    )
+    assert valid == ["a"]
+    assert rejections.reasons == {
+        ("script", "bad-signature"): 1,
+        ("script", "invalid-ancestor"): 1,
+    }
+
+
+def test_valid_double_spend_wins():
+    valid, rejections = screen(
+        [summary("a", [("x", 0)], 100), summary("b", [("x", 0)], 1000)], {}
+    )
+    assert valid == ["b"]
+    assert rejections.reasons == {("conflict", "outpoint-conflict"): 1}
@@ -0,0 +1,83 @@
+import hashlib
+
+import pytest
+
+from validations.script import (
+    MAX_OPS_PER_SCRIPT,
+    MAX_SCRIPT_ELEMENT_SIZE,
+    OP_1,
+    OP_DROP,
+    OP_ELSE,
+    OP_ENDIF,
+    OP_IF,
+    OP_NOP,
+    OP_PUSHDATA2,
+    _execute_witness_program,
+    cast_to_bool,
+    execute_script,
+)
+
+
+def push(data):
+    return bytes([OP_PUSHDATA2]) + len(data).to_bytes(2, "little") + data
+
+
+class _Checker:
+    segwit = False
+
+
+def run(script):
+    stack = execute_script(script, [], None)
+    return len(stack) == 1 and cast_to_bool(stack[0])
+
+
+def test_push_at_element_limit():
+    assert run(push(bytes(MAX_SCRIPT_ELEMENT_SIZE)) + bytes([OP_DROP, OP_1]))
+
+
+def test_oversized_push():
+    with pytest.raises(ValueError):
+        run(push(bytes(MAX_SCRIPT_ELEMENT_SIZE + 1)) + bytes([OP_DROP, OP_1]))
+
+
+def test_oversized_push_in_unexecuted_branch():
+    script = bytes([0, OP_IF]) + push(bytes(521)) + bytes([OP_ENDIF, OP_1])
+    with pytest.raises(ValueError):
+        run(script)
+
+
+def test_operation_limit():
+    assert run(bytes([OP_NOP] * MAX_OPS_PER_SCRIPT + [OP_1]))
+    with pytest.raises(ValueError):
+        run(bytes([OP_NOP] * (MAX_OPS_PER_SCRIPT + 1) + [OP_1]))
+
+
+def test_operation_limit_counts_unexecuted_opcodes():
+    script = bytes([0, OP_IF] + [OP_NOP] * MAX_OPS_PER_SCRIPT + [OP_ENDIF, OP_1])
+    with pytest.raises(ValueError):
+        run(script)
+
+
+@pytest.mark.parametrize("opcode", [0x7E, 0x83, 0x8D, 0x95, 0x99])
+def test_disabled_opcode_in_unexecuted_branch(opcode):
+    with pytest.raises(ValueError):
+        run(bytes([0, OP_IF, opcode, OP_ENDIF, OP_1]))
+
+
+@pytest.mark.parametrize("opcode", [0x65, 0x66])
+def test_verif_in_unexecuted_branch(opcode):
+    with pytest.raises(ValueError):
+        run(bytes([0, OP_IF, opcode, OP_ELSE, OP_ENDIF, OP_1]))
+
+
+def test_unexecuted_branch_skips_other_opcodes():
+    # OP_RESERVED only fails when executed.
+    assert run(bytes([0, OP_IF, 0x50, OP_ENDIF, OP_1]))
+
+
+def test_oversized_p2wsh_witness_item():
+    script = bytes([OP_DROP, OP_1])
+    program = hashlib.sha256(script).digest()
+    _execute_witness_program(0, program, [bytes(520), script], _Checker())
+    with pytest.raises(ValueError):
+        _execute_witness_program(0, program, [bytes(521), script], _Checker())
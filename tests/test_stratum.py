@@ -0,0 +1,57 @@
+import asyncio
+import json
+
+from block.header import DIFFICULTY_TARGET
+from mine.miner import find_nonce
+from mine.stratum import JobServer, job_header_prefix
+
+TEMPLATE = [{"txid": "11" * 32, "wtxid": "22" * 32}]
+NEXT_TEMPLATE = [{"txid": "33" * 32, "wtxid": "44" * 32}]
+
+
+def test_malformed_messages_get_an_error(tmp_path):
+    async def exchange():
+        server = await JobServer(str(tmp_path / "jobs.sock")).start()
+        server.set_template(TEMPLATE)
+        reader, writer = await asyncio.open_unix_connection(server.address)
+        replies = []
+
+        async def request(line):
+            writer.write(line + b"\n")
+            await writer.drain()
+            replies.append(json.loads(await reader.readline()))
+
+        await request(b'{"id": 1, "method": "subscribe"}')
+        await reader.readline()  # the current job
+        await request(b"[1, 2]")
+        await request(b"not json")
+        await request(b'{"id": 2, "method": "submit"}')
+        await request(b'{"id": 3, "method": "submit", "params": {"job_id": "0"}}')
+        writer.close()
+        await server.close()
+        return replies
+
+    replies = asyncio.run(exchange())
+    assert [reply.get("error") for reply in replies] == [
+        None,
+        "bad-message",
+        "bad-message",
+        "bad-params",
+        "bad-params",
+    ]
+
+
+def test_block_found_before_a_template_change_is_kept():
+    async def mine():
+        server = JobServer("unused")
+        job = server.set_template(TEMPLATE)
+        prefix = job_header_prefix(job, 0)
+        nonce = find_nonce(prefix, int(DIFFICULTY_TARGET, 16), workers=1)
+        params = {"job_id": job["job_id"], "extranonce2": 0, "nonce": nonce}
+        assert server._submit(0, params) is None
+        server.set_template(NEXT_TEMPLATE)
+        return await asyncio.wait_for(server.next_block(), 1)
+
+    transactions, (_, txids, _, _, _) = asyncio.run(mine())
+    assert transactions == TEMPLATE
+    assert txids == [TEMPLATE[0]["txid"]]
@@ -0,0 +1,164 @@
+from array import array
+
+import pytest
+
+from mine.transaction import TxIn
+from transaction_serialization import decode_transaction
+from validations.sighash import SighashCache
+from validations.taproot import UnsupportedScript, taproot_signature_job
+
+# BIP341 wallet-test-vectors.json, keyPathSpending[0].
+SIGNED_TX = bytes.fromhex(
+    "020000000001097de20cbff686da83a54981d2b9bab3586f4ca7e48f57f5"
+    "b55963115f3b334e9c010000000000000000d7b7cab57b1393ace2d064f4"
+    "d4a2cb8af6def61273e127517d44759b6dafdd990000000000fffffffff8"
+    "e1f583384333689228c5d28eac13366be082dc57441760d957275419a418"
+    "42000000006b4830450221008f3b8f8f0537c420654d2283673a761b7ee2"
+    "ea3c130753103e08ce79201cf32a022079e7ab904a1980ef1c5890b648c8"
+    "783f4d10103dd62f740d13daa79e298d50c201210279be667ef9dcbbac55"
+    "a06295ce870b07029bfcdb2dce28d959f2815b16f81798fffffffff06891"
+    "80aa63b30cb162a73c6d2a38b7eeda2a83ece74310fda0843ad604853b01"
+    "00000000feffffffaa5202bdf6d8ccd2ee0f0202afbbb7461d9264a25e5b"
+    "fd3c5a52ee1239e0ba6c0000000000feffffff956149bdc66faa968eb2be"
+    "2d2faa29718acbfe3941215893a2a3446d32acd050000000000000000000"
+    "e664b9773b88c09c32cb70a2a3e4da0ced63b7ba3b22f848531bbb1d5d5f"
+    "4c94010000000000000000e9aa6b8e6c9de67619e6a3924ae25696bb7b69"
+    "4bb677a632a74ef7eadfd4eabf0000000000ffffffffa778eb6a263dc090"
+    "464cd125c466b5a99667720b1c110468831d058aa1b82af10100000000ff"
+    "ffffff0200ca9a3b000000001976a91406afd46bcdfd22ef94ac122aa11f"
+    "241244a37ecc88ac807840cb0000000020ac9a87f5594be208f8532db38c"
+    "ff670c450ed2fea8fcdefcc9a663f78bab962b0141ed7c1647cb97379e76"
+    "892be0cacff57ec4a7102aa24296ca39af7541246d8ff14d38958d4cc1e2"
+    "e478e4d4a764bbfd835b16d4e314b72937b29833060b87276c030141052a"
+    "edffc554b41f52b521071793a6b88d6dbca9dba94cf34c83696de0c1ec35"
+    "ca9c5ed4ab28059bd606a4f3a657eec0bb96661d42921b5f50a95ad33675"
+    "b54f83000141ff45f742a876139946a149ab4d9185574b98dc919d2eb675"
+    "4f8abaa59d18b025637a3aa043b91817739554f4ed2026cf8022dbd83e35"
+    "1ce1fabc272841d2510a010140b4010dd48a617db09926f729e79c33ae0b"
+    "4e94b79f04a1ae93ede6315eb3669de185a17d2b0ac9ee09fd4c64b678a0"
+    "b61a0a86fa888a273c8511be83bfd6810f0247304402202b795e4de72646"
+    "d76eab3f0ab27dfa30b810e856ff3a46c9a702df53bb0d8cc302203ccc4d"
+    "822edab5f35caddb10af1be93583526ccfbade4b4ead350781e2f8adcd01"
+    "2102f9308a019258c31049344f85f89d5229b531c845836f99b08601f113"
+    "bce036f90141a3785919a2ce3c4ce26f298c3d51619bc474ae24014bcdd3"
+    "1328cd8cfbab2eff3395fa0a16fe5f486d12f22a9cedded5ae74feb4bbe5"
+    "351346508c5405bcfee0020141ea0c6ba90763c2d3a296ad82ba45881abb"
+    "4f426b3f87af162dd24d5109edc1cdd11915095ba47c3a9963dc1e6c4329"
+    "39872bc49212fe34c632cd3ab9fed429c4820141bbc9584a11074e83bc8c"
+    "6759ec55401f0ae7b03ef290c3139814f545b58a9f8127258000874f44bc"
+    "46db7646322107d4d86aec8e73b8719a61fff761d75b5dd9810065cd1d"
+)
+SPENT = [
+    ("512053a1f6e454df1aa2776a2814a721372d6258050de330b3c6d10ee8f4e0dda343", 420000000),
+    ("5120147c9c57132f6e7ecddba9800bb0c4449251c92a1e60371ee77557b6620f3ea3", 462000000),
+    ("76a914751e76e8199196d454941c45d1b3a323f1433bd688ac", 294000000),
+    ("5120e4d810fd50586274face62b8a807eb9719cef49c04177cc6b76a9a4251d5450e", 504000000),
+    ("512091b64d5324723a985170e4dc5a0f84c041804f2cd12660fa5dec09fc21783605", 630000000),
+    ("00147dd65592d0ab2fe0d0257d571abf032cd9db93dc", 378000000),
+    ("512075169f4001aa68f15bbed28b218df1d0a62cbbcf1188c6665110c293c907b831", 672000000),
+    ("5120712447206d7a5238acc7ff53fbe94a3b64539ad291c7cdbc490b7577e4b17df5", 546000000),
+    ("512077e30a5522dd9f894c3f8b8bd4c4b2cf82ca7da8a3ea6a239655c39c050ab220", 588000000),
+]
+HASHES = (
+    "e3b33bb4ef3a52ad1fffb555c0d82828eb22737036eaeb02a235d82b909c4c3f",
+    "58a6964a4f5f8f0b642ded0a8a553be7622a719da71d1f5befcefcdee8e0fde6",
+    "23ad0f61ad2bca5ba6a7693f50fce988e17c3780bf2b1e720cfbb38fbdd52e21",
+    "18959c7221ab5ce9e26c3cd67b22c24f8baa54bac281d8e6b05e400e6c3a957e",
+    "a2e6dab7c1f0dcd297c8d61647fd17d821541ea69c3cc37dcbad7f90d4eb4bc5",
+)
+# (input index, hash type, sighash)
+KEY_PATH = [
+    (0, 0x03, "2514a6272f85cfa0f45eb907fcb0d121b808ed37c6ea160a5a9046ed5526d555"),
+    (1, 0x83, "325a644af47e8a5a2591cda0ab0723978537318f10e6a63d4eed783b96a71a4d"),
+    (3, 0x01, "bf013ea93474aa67815b1b6cc441d23b64fa310911d991e713cd34c7f5d46669"),
+    (4, 0x00, "4f900a0bae3f1446fd48490c2958b5a023228f01661cda3496a11da502a7f7ef"),
+    (6, 0x02, "15f25c298eb5cdc7eb1d638dd2d45c97c4c59dcaec6679cfc16ad84f30876b85"),
+    (7, 0x82, "cd292de50313804dabe4685e83f923d2969577191a3e1d2882220dca88cbeb10"),
+    (8, 0x81, "cccb739eca6c13a8a89e6e5cd317ffe55669bbda23f2fd37b0f18755e008edd2"),
+]
+
+
+def signed_transaction():
+    transaction = decode_transaction(SIGNED_TX)
+    transaction.vin = [
+        TxIn(i.txid, i.vout, i.scriptsig, i.witness, bytes.fromhex(script), None)
+        for i, (script, _) in zip(transaction.vin, SPENT)
+    ]
+    transaction.input_values = array("q", [amount for _, amount in SPENT])
+    return transaction
+
+
+def with_witness(transaction, index, witness):
+    old = transaction.vin[index]
+    transaction.vin[index] = TxIn(
+        old.txid, old.vout, old.scriptsig, tuple(witness), old.prevout_script, None
+    )
+    return transaction
+
+
+def test_precomputed_hashes():
+    cache = SighashCache(signed_transaction())
+    cache.taproot_digest(0, 0x00)
+    assert tuple(h.hex() for h in cache.taproot_hashes) == HASHES
+
+
+@pytest.mark.parametrize("index, hash_type, sighash", KEY_PATH)
+def test_key_path_digest(index, hash_type, sighash):
+    cache = SighashCache(signed_transaction())
+    assert cache.taproot_digest(index, hash_type).hex() == sighash
+
+
+@pytest.mark.parametrize("index, hash_type, sighash", KEY_PATH)
+def test_key_path_signature(index, hash_type, sighash):
+    transaction = signed_transaction()
+    job = taproot_signature_job(transaction, index, SighashCache(transaction))
+    assert job.digest.hex() == sighash
+    assert job.verify()
+
+
+def test_tampered_signature():
+    transaction = signed_transaction()
+    job = taproot_signature_job(transaction, 4, SighashCache(transaction))
+    job.signature = bytes([job.signature[0] ^ 1]) + job.signature[1:]
+    assert not job.verify()
+
+
+def test_explicit_default_hash_type_is_rejected():
+    # SIGHASH_DEFAULT must be signalled by a 64-byte signature.
+    transaction = signed_transaction()
+    (signature,) = transaction.vin[4].witness
+    with_witness(transaction, 4, [signature + b"\x00"])
+    assert taproot_signature_job(transaction, 4, SighashCache(transaction)) is None
+
+
+def test_invalid_hash_type():
+    transaction = signed_transaction()
+    (signature,) = transaction.vin[4].witness
+    with_witness(transaction, 4, [signature + b"\x04"])
+    with pytest.raises(ValueError):
+        taproot_signature_job(transaction, 4, SighashCache(transaction))
+
+
+def test_single_without_matching_output():
+    cache = SighashCache(signed_transaction())
+    with pytest.raises(ValueError):
+        cache.taproot_digest(3, 0x03)
+
+
+def test_annex_is_committed_to():
+    transaction = signed_transaction()
+    (signature,) = transaction.vin[4].witness
+    annex = b"\x50\x01\x02"
+    with_witness(transaction, 4, [signature, annex])
+    cache = SighashCache(transaction)
+    job = taproot_signature_job(transaction, 4, cache)
+    assert job.digest == cache.taproot_digest(4, 0x00, annex)
+    assert job.digest.hex() != KEY_PATH[3][2]
+    assert not job.verify()
+
+
+def test_script_path_is_unsupported():
+    transaction = signed_transaction()
+    with_witness(transaction, 4, [b"\x01", b"\x51", b"\xc0" + bytes(32)])
+    with pytest.raises(UnsupportedScript):
+        taproot_signature_job(transaction, 4, SighashCache(transaction))
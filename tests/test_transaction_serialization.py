@@ -0,0 +1,35 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from mempool_loader import load_transaction_file, scan_mempool
+from transaction_serialization import (
+    hash_stripped,
+    hash_transaction,
+    hash_transactions,
+)
+
+
+def sample_transactions(count=200):
+    return [load_transaction_file(name) for name in scan_mempool()[:count]]
+
+
+def test_hash_transaction_matches_batched_hashes():
+    transactions = sample_transactions()
+    expected = hash_transactions(transactions)
+    assert [hash_transaction(tx) for tx in transactions] == expected
+
+
+def test_hashing_from_many_threads():
+    transactions = sample_transactions()
+    expected = hash_transactions(transactions)
+    stripped = [(txid, base_size) for txid, _, base_size, _ in expected]
+
+    def work(_):
+        return (
+            [hash_transaction(tx) for tx in transactions],
+            [hash_stripped(tx) for tx in transactions],
+        )
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for full, partial in executor.map(work, range(16)):
+            assert full == expected
+            assert partial == stripped
@@ -1,4 +1,10 @@
-from utilities import convert_to_little_endian, calculate_compact_size
+import hashlib
+import struct
+import threading
+from array import array
+
+from mine.transaction import Transaction, TxIn, TxOut
+from utilities import convert_to_little_endian, calculate_compact_size, hash256_many
 
 
 def serialize_transaction(txn_data):
@@ -36,3 +42,222 @@ def serialize_transaction(txn_data):
     serialized_txn += f"{convert_to_little_endian(data['locktime'], 4)}"
 
     return serialized_txn
+
+
+_U32 = struct.Struct("<I").pack
+_U64 = struct.Struct("<Q").pack
+_MARKER_FLAG = b"\x00\x01"
+
+# Reused across calls so hashing the mempool does not allocate a new
+# buffer per transaction. One pair per thread: the pipeline, the miner and
+# the job worker all hash from threads of their own.
+_buffers = threading.local()
+
+
+def _thread_buffers():
+    try:
+        return _buffers.stripped, _buffers.witness
+    except AttributeError:
+        _buffers.stripped, _buffers.witness = bytearray(), bytearray()
+        return _buffers.stripped, _buffers.witness
+
+
+def write_compact_size(buffer, value):
+    if value < 0xFD:
+        buffer.append(value)
+    elif value <= 0xFFFF:
+        buffer.append(0xFD)
+        buffer += value.to_bytes(2, "little")
+    elif value <= 0xFFFFFFFF:
+        buffer.append(0xFE)
+        buffer += _U32(value)
+    else:
+        buffer.append(0xFF)
+        buffer += _U64(value)
+
+
+def read_compact_size(data, offset):
+    prefix = data[offset]
+    offset += 1
+    if prefix < 0xFD:
+        return prefix, offset
+    size = {0xFD: 2, 0xFE: 4, 0xFF: 8}[prefix]
+    return int.from_bytes(data[offset : offset + size], "little"), offset + size
+
+
+def _read_bytes(data, offset):
+    length, offset = read_compact_size(data, offset)
+    end = offset + length
+    if end > len(data):
+        raise ValueError("Transaction data ends inside a field")
+    return bytes(data[offset:end]), end
+
+
+def decode_transaction(raw):
+    # Parses a legacy or BIP144 transaction into the Transaction model. The
+    # spent outputs are not part of the encoding, so input values are zero
+    # and prevout scripts empty.
+    version = int.from_bytes(raw[0:4], "little")
+    has_witness = raw[4:6] == _MARKER_FLAG
+    offset = 6 if has_witness else 4
+
+    vin = []
+    sequences = array("I")
+    count, offset = read_compact_size(raw, offset)
+    for _ in range(count):
+        txid = bytes(raw[offset : offset + 32])
+        vout = int.from_bytes(raw[offset + 32 : offset + 36], "little")
+        scriptsig, offset = _read_bytes(raw, offset + 36)
+        sequences.append(int.from_bytes(raw[offset : offset + 4], "little"))
+        offset += 4
+        vin.append(TxIn(txid, vout, scriptsig, (), b"", None))
+
+    vout = []
+    output_values = array("q")
+    count, offset = read_compact_size(raw, offset)
+    for _ in range(count):
+        output_values.append(int.from_bytes(raw[offset : offset + 8], "little"))
+        scriptpubkey, offset = _read_bytes(raw, offset + 8)
+        vout.append(TxOut(scriptpubkey, None))
+
+    if has_witness:
+        for input_data in vin:
+            items = []
+            count, offset = read_compact_size(raw, offset)
+            for _ in range(count):
+                item, offset = _read_bytes(raw, offset)
+                items.append(item)
+            input_data.witness = tuple(items)
+
+    locktime = int.from_bytes(raw[offset : offset + 4], "little")
+    if offset + 4 != len(raw):
+        raise ValueError("Transaction data has the wrong length")
+    return Transaction(
+        version,
+        locktime,
+        vin,
+        vout,
+        array("q", [0] * len(vin)),
+        output_values,
+        sequences,
+    )
+
+
+def encode_transaction(transaction, stripped, witness=None):
+    # One walk over a mine.transaction.Transaction: `stripped` receives the
+    # legacy (txid) encoding and `witness` the per-input witness stacks that
+    # a BIP144 encoding inserts before the locktime. With no `witness`
+    # buffer the witness stacks are not touched at all.
+    del stripped[:]
+    if witness is not None:
+        del witness[:]
+    has_witness = False
+
+    stripped += _U32(transaction.version)
+    write_compact_size(stripped, len(transaction.vin))
+    for input_data, sequence in zip(transaction.vin, transaction.sequences):
+        stripped += input_data.txid
+        stripped += _U32(input_data.vout)
+        write_compact_size(stripped, len(input_data.scriptsig))
+        stripped += input_data.scriptsig
+        stripped += _U32(sequence)
+
+        if witness is None:
+            continue
+        items = input_data.witness
+        write_compact_size(witness, len(items))
+        for item in items:
+            write_compact_size(witness, len(item))
+            witness += item
+        has_witness = has_witness or bool(items)
+
+    write_compact_size(stripped, len(transaction.vout))
+    for output, value in zip(transaction.vout, transaction.output_values):
+        stripped += _U64(value)
+        write_compact_size(stripped, len(output.scriptpubkey))
+        stripped += output.scriptpubkey
+
+    stripped += _U32(transaction.locktime)
+    return has_witness
+
+
+def full_encoding(stripped, witness, has_witness):
+    if not has_witness:
+        return bytes(stripped)
+    view = memoryview(stripped)
+    return b"".join((view[:4], _MARKER_FLAG, view[4:-4], witness, view[-4:]))
+
+
+def hash_stripped(transaction):
+    # txid in internal byte order and the stripped size; enough for fee
+    # rates, and the witness stacks stay undecoded.
+    stripped, _ = _thread_buffers()
+    encode_transaction(transaction, stripped)
+    txid = hashlib.sha256(hashlib.sha256(stripped).digest()).digest()
+    return txid, len(stripped)
+
+
+def hash_transactions(transactions, with_wtxid=True):
+    # Batched hash_transaction(): every encoding is built first and then all
+    # txids, and all wtxids, go through one hash256_many call each. Without
+    # with_wtxid the witness stacks stay undecoded and wtxid is None.
+    stripped_encodings = []
+    full_encodings = []
+    sizes = []
+    witness = bytearray() if with_wtxid else None
+    for transaction in transactions:
+        stripped = bytearray()
+        has_witness = encode_transaction(transaction, stripped, witness)
+        stripped_encodings.append(stripped)
+        if not with_wtxid:
+            sizes.append((len(stripped), transaction.witness_size()))
+        elif has_witness:
+            full_encodings.append(full_encoding(stripped, witness, True))
+            sizes.append((len(stripped), len(_MARKER_FLAG) + len(witness)))
+        else:
+            full_encodings.append(stripped)
+            sizes.append((len(stripped), 0))
+
+    txids = hash256_many(stripped_encodings)
+    wtxids = hash256_many(full_encodings) if with_wtxid else None
+    results = []
+    for position, (base_size, witness_size) in enumerate(sizes):
+        offset = position * 32
+        txid = txids[offset : offset + 32]
+        wtxid = wtxids[offset : offset + 32] if with_wtxid else None
+        results.append((txid, wtxid, base_size, witness_size))
+    return results
+
+
+def transaction_wtxid(transaction):
+    # Memoized on the transaction; the first call for a witness transaction
+    # is what decodes its witness stacks.
+    if transaction.wtxid is None:
+        if transaction.has_witness():
+            transaction.wtxid = hash_transaction(transaction)[1]
+        else:
+            transaction.wtxid = transaction.txid
+    return transaction.wtxid
+
+
+def hash_transaction(transaction):
+    # Returns txid and wtxid in internal byte order together with the
+    # stripped size and the extra bytes the witness serialization adds.
+    stripped, witness = _thread_buffers()
+    has_witness = encode_transaction(transaction, stripped, witness)
+    view = memoryview(stripped)
+
+    txid = hashlib.sha256(hashlib.sha256(view).digest()).digest()
+    base_size = len(stripped)
+    if not has_witness:
+        view.release()
+        return txid, txid, base_size, 0
+
+    inner = hashlib.sha256(view[:4])
+    inner.update(_MARKER_FLAG)
+    inner.update(view[4:-4])
+    inner.update(witness)
+    inner.update(view[-4:])
+    view.release()
+    wtxid = hashlib.sha256(inner.digest()).digest()
+    return txid, wtxid, base_size, len(_MARKER_FLAG) + len(witness)
@@ -1,4 +1,14 @@
 import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# hashlib only drops the GIL for inputs longer than this, so small records
+# (Merkle node pairs, most transactions) are hashed on the calling thread.
+GIL_RELEASE_SIZE = 2048
+# Batches smaller than this are not worth handing to the thread pool.
+THREAD_BATCH_BYTES = 1 << 20
+
+_executor = None
 
 
 def calculate_compact_size(value):
@@ -30,3 +40,53 @@ def hash256(hex_input):
     return (
         hashlib.sha256(hashlib.sha256(bytes.fromhex(hex_input)).digest()).digest().hex()
     )
+
+
+def double_sha256(data):
+    return hashlib.sha256(hashlib.sha256(data).digest()).digest()
+
+
+def hash160(data):
+    return hashlib.new("ripemd160", hashlib.sha256(data).digest()).digest()
+
+
+def _hash256_items(items):
+    sha256 = hashlib.sha256
+    return b"".join([sha256(sha256(item).digest()).digest() for item in items])
+
+
+def _thread_pool():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1)
+    return _executor
+
+
+def hash256_many(buffers, record_size=None):
+    # Double SHA-256 of every buffer, packed into one bytes object of 32-byte
+    # digests. `buffers` is a list of bytes-like objects, or one contiguous
+    # buffer of `record_size`-byte records. Large batches of large buffers
+    # are split across a thread pool.
+    if record_size is not None:
+        view = memoryview(buffers)
+        items = [
+            view[offset : offset + record_size]
+            for offset in range(0, len(view), record_size)
+        ]
+    else:
+        items = buffers
+    if not items:
+        return b""
+
+    total = sum(len(item) for item in items)
+    workers = os.cpu_count() or 1
+    if (
+        workers == 1
+        or total < THREAD_BATCH_BYTES
+        or total < GIL_RELEASE_SIZE * len(items)
+    ):
+        return _hash256_items(items)
+
+    step = -(-len(items) // workers)
+    chunks = [items[start : start + step] for start in range(0, len(items), step)]
+    return b"".join(_thread_pool().map(_hash256_items, chunks))
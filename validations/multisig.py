@@ -0,0 +1,51 @@
+from functools import lru_cache
+
+from coincurve import PublicKey
+
+MAX_PUBKEYS_PER_MULTISIG = 20
+
+
+@lru_cache(maxsize=8192)
+def load_pubkey(data):
+    # Parsing a compressed key costs a square root; multisig wallets reuse
+    # the same keys across many inputs, so parsed keys are kept.
+    return PublicKey(data)
+
+
+def verify_ecdsa(digest, signature, pubkey):
+    try:
+        return load_pubkey(pubkey).verify(signature, digest, hasher=None)
+    except ValueError:
+        return False
+
+
+class MultisigJob:
+    # One OP_CHECKMULTISIG for the batch verifier: a digest and DER
+    # signature per signature, and the keys in script order.
+    __slots__ = ("digests", "signatures", "pubkeys")
+
+    def __init__(self, digests, signatures, pubkeys):
+        self.digests = digests
+        self.signatures = signatures
+        self.pubkeys = pubkeys
+
+    def verify(self):
+        return verify_multisig(self.digests, self.signatures, self.pubkeys)
+
+
+def verify_multisig(digests, signatures, pubkeys):
+    # Signatures must match keys in the same order, so one cursor walks the
+    # keys: a key that fails the current signature is never tried again.
+    # Stops as soon as the keys left are fewer than the signatures left.
+    key = 0
+    remaining = len(signatures)
+    for digest, signature in zip(digests, signatures):
+        while True:
+            if len(pubkeys) - key < remaining:
+                return False
+            matched = verify_ecdsa(digest, signature, pubkeys[key])
+            key += 1
+            if matched:
+                break
+        remaining -= 1
+    return True
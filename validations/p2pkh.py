@@ -1,8 +1,10 @@
 import os
 import json
-import hashlib
 import coincurve
 
+from utilities import hash160
+from validations.script import parse_pushes
+
 
 def validate_signature(signature, message, publicKey):
     b_sig = bytes.fromhex(signature)
@@ -32,65 +34,6 @@ def _little_endian(num, size):
     return num.to_bytes(size, byteorder="little").hex()
 
 
-def segwit_txn_data(txn_id):
-    file_path = os.path.join("mempool", f"{txn_id}.json")
-    if os.path.exists(file_path):
-        with open(file_path, "r") as f:
-            data = json.load(f)
-            ver = f"{_little_endian(data['version'], 4)}"
-            serialized_txid_vout = ""
-            for iN in data["vin"]:
-                serialized_txid_vout += f"{bytes.fromhex(iN['txid'])[::-1].hex()}"
-                serialized_txid_vout += f"{_little_endian(iN['vout'], 4)}"
-            hash256_in = (
-                hashlib.sha256(
-                    hashlib.sha256(bytes.fromhex(serialized_txid_vout)).digest()
-                )
-                .digest()
-                .hex()
-            )
-            serialized_sequense = ""
-            for iN in data["vin"]:
-                serialized_sequense += f"{_little_endian(iN['sequence'], 4)}"
-            hash256_seq = (
-                hashlib.sha256(
-                    hashlib.sha256(bytes.fromhex(serialized_sequense)).digest()
-                )
-                .digest()
-                .hex()
-            )
-            ser_tx_vout_sp = f"{bytes.fromhex(data['vin'][0]['txid'])[::-1].hex()}{_little_endian(data['vin'][0]['vout'], 4)}"
-            pkh = f"{data['vin'][0]['prevout']['scriptpubkey'][6:-4]}"
-            scriptcode = f"1976a914{pkh}88ac"
-            in_amt = f"{_little_endian(data['vin'][0]['prevout']['value'], 8)}"
-            sequence_txn = f"{_little_endian(data['vin'][0]['sequence'], 4)}"
-            serialized_output = ""
-            for out in data["vout"]:
-                serialized_output += f"{_little_endian(out['value'], 8)}"
-                serialized_output += f"{_to_compact_size(len(out['scriptpubkey'])//2)}"
-                serialized_output += f"{out['scriptpubkey']}"
-            hash256_out = (
-                hashlib.sha256(
-                    hashlib.sha256(bytes.fromhex(serialized_output)).digest()
-                )
-                .digest()
-                .hex()
-            )
-            locktime = f"{_little_endian(data['locktime'], 4)}"
-            preimage = (
-                ver
-                + hash256_in
-                + hash256_seq
-                + ser_tx_vout_sp
-                + scriptcode
-                + in_amt
-                + sequence_txn
-                + hash256_out
-                + locktime
-            )
-    return preimage
-
-
 def legacy_txn_data(txn_id):
     txn_hash = ""
     file_path = os.path.join("mempool", f"{txn_id}.json")
@@ -114,32 +57,21 @@ def legacy_txn_data(txn_id):
     return txn_hash
 
 
-def validate_p2pkh_txn(signature, pubkey, scriptpubkey_asm, txn_data):
-    stack = []
-    stack.append(signature)
-    stack.append(pubkey)
-    for i in scriptpubkey_asm:
-        if i == "OP_DUP":
-            stack.append(stack[-1])
-        if i == "OP_HASH160":
-            sha = hashlib.sha256(bytes.fromhex(stack[-1])).hexdigest()
-            hash_160 = hashlib.new("ripemd160")
-            hash_160.update(bytes.fromhex(sha))
-            stack.pop(-1)
-            stack.append(hash_160.hexdigest())
-        if i == "OP_EQUALVERIFY":
-            if stack[-1] != stack[-2]:
-                return False
-            else:
-                stack.pop(-1)
-                stack.pop(-1)
-        if i == "OP_CHECKSIG":
-            if signature[-2:] == "01":
-                der_sig = signature[:-2]
-                msg = txn_data + "01000000"
-                msg_hash = hashlib.sha256(bytes.fromhex(msg)).digest().hex()
-                return validate_signature(der_sig, msg_hash, pubkey)
-        if i == "OP_PUSHBYTES_20":
-            stack.append(
-                scriptpubkey_asm[scriptpubkey_asm.index("OP_PUSHBYTES_20") + 1]
-            )
+def p2pkh_signature_job(transaction, index, cache):
+    # (sighash, DER signature, pubkey) for input `index`, or None when the
+    # scripts themselves do not check out and no signature work is needed.
+    input_data = transaction.vin[index]
+    scriptpubkey = input_data.prevout_script
+    pushes = parse_pushes(input_data.scriptsig)
+    if pushes is None or len(pushes) != 2 or not pushes[0]:
+        return None
+    signature, pubkey = pushes
+    if (
+        len(scriptpubkey) != 25
+        or scriptpubkey[:3] != b"\x76\xa9\x14"
+        or scriptpubkey[23:] != b"\x88\xac"
+        or hash160(pubkey) != scriptpubkey[3:23]
+    ):
+        return None
+    digest = cache.legacy_digest(index, scriptpubkey, signature[-1])
+    return digest, signature[:-1], pubkey
@@ -1,8 +1,7 @@
-import os
-import json
-import hashlib
 import coincurve
 
+from utilities import hash160
+
 
 def validate_signature(signature, message, publicKey):
     b_sig = bytes.fromhex(signature)
@@ -11,85 +10,6 @@ def validate_signature(signature, message, publicKey):
     return coincurve.verify_signature(b_sig, b_msg, b_pub)
 
 
-def _to_compact_size(value):
-    if value < 0xFD:
-        return value.to_bytes(1, byteorder="little").hex()
-    elif value <= 0xFFFF:
-        return (0xFD).to_bytes(1, byteorder="little").hex() + value.to_bytes(
-            2, byteorder="little"
-        ).hex()
-    elif value <= 0xFFFFFFFF:
-        return (0xFE).to_bytes(1, byteorder="little").hex() + value.to_bytes(
-            4, byteorder="little"
-        ).hex()
-    else:
-        return (0xFF).to_bytes(1, byteorder="little").hex() + value.to_bytes(
-            8, byteorder="little"
-        ).hex()
-
-
-def _little_endian(num, size):
-    return num.to_bytes(size, byteorder="little").hex()
-
-
-def segwit_txn_data(txn_id):
-    file_path = os.path.join("mempool", f"{txn_id}.json")
-    if os.path.exists(file_path):
-        with open(file_path, "r") as f:
-            data = json.load(f)
-            ver = f"{_little_endian(data['version'], 4)}"
-            serialized_txid_vout = ""
-            for iN in data["vin"]:
-                serialized_txid_vout += f"{bytes.fromhex(iN['txid'])[::-1].hex()}"
-                serialized_txid_vout += f"{_little_endian(iN['vout'], 4)}"
-            hash256_in = (
-                hashlib.sha256(
-                    hashlib.sha256(bytes.fromhex(serialized_txid_vout)).digest()
-                )
-                .digest()
-                .hex()
-            )
-            serialized_sequense = ""
-            for iN in data["vin"]:
-                serialized_sequense += f"{_little_endian(iN['sequence'], 4)}"
-            hash256_seq = (
-                hashlib.sha256(
-                    hashlib.sha256(bytes.fromhex(serialized_sequense)).digest()
-                )
-                .digest()
-                .hex()
-            )
-            ser_tx_vout_sp = f"{bytes.fromhex(data['vin'][0]['txid'])[::-1].hex()}{_little_endian(data['vin'][0]['vout'], 4)}"
-            scriptcode = f"1976a914{data['vin'][0]['prevout']['scriptpubkey'][4:]}88ac"
-            in_amt = f"{_little_endian(data['vin'][0]['prevout']['value'], 8)}"
-            sequence_txn = f"{_little_endian(data['vin'][0]['sequence'], 4)}"
-            serialized_output = ""
-            for out in data["vout"]:
-                serialized_output += f"{_little_endian(out['value'], 8)}"
-                serialized_output += f"{_to_compact_size(len(out['scriptpubkey'])//2)}"
-                serialized_output += f"{out['scriptpubkey']}"
-            hash256_out = (
-                hashlib.sha256(
-                    hashlib.sha256(bytes.fromhex(serialized_output)).digest()
-                )
-                .digest()
-                .hex()
-            )
-            locktime = f"{_little_endian(data['locktime'], 4)}"
-            preimage = (
-                ver
-                + hash256_in
-                + hash256_seq
-                + ser_tx_vout_sp
-                + scriptcode
-                + in_amt
-                + sequence_txn
-                + hash256_out
-                + locktime
-            )
-    return preimage
-
-
 def validate_p2wpkh_txn(witness, wit_scriptpubkey_asm, txn_data):
     wit_sig, wit_pubkey = witness[0], witness[1]
 
@@ -105,3 +25,23 @@ def validate_p2wpkh_txn(witness, wit_scriptpubkey_asm, txn_data):
     ]
 
     return validate_signature(wit_sig, txn_data, wit_pubkey)
+
+
+def p2wpkh_signature_job(transaction, index, cache):
+    input_data = transaction.vin[index]
+    scriptpubkey = input_data.prevout_script
+    witness = input_data.witness
+    if input_data.scriptsig or len(witness) != 2 or not witness[0]:
+        return None
+    signature, pubkey = witness
+    if (
+        len(scriptpubkey) != 22
+        or scriptpubkey[:2] != b"\x00\x14"
+        or hash160(pubkey) != scriptpubkey[2:]
+    ):
+        return None
+    script_code = b"\x76\xa9\x14" + scriptpubkey[2:] + b"\x88\xac"
+    digest = cache.segwit_digest(
+        index, script_code, transaction.input_values[index], signature[-1]
+    )
+    return digest, signature[:-1], pubkey
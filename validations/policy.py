@@ -0,0 +1,105 @@
+from collections import Counter
+
+import metrics
+
+MAX_MONEY = 21_000_000 * 100_000_000
+MAX_STANDARD_TX_WEIGHT = 400_000
+MAX_OP_RETURN_SIZE = 83
+# Smallest standard output per script type at Bitcoin Core's default dust
+# relay fee of 3 sat/vB. OP_RETURN outputs are unspendable and exempt.
+DUST_LIMITS = {
+    "p2pkh": 546,
+    "p2sh": 540,
+    "v0_p2wpkh": 294,
+    "v0_p2wsh": 330,
+    "v1_p2tr": 330,
+}
+STANDARD_OUTPUTS = set(DUST_LIMITS) | {"op_return"}
+
+# Every reason check_structure() can return. The snapshot stores a reason as
+# its position here, so only append, and bump the snapshot magic if an
+# entry ever has to change.
+STRUCTURE_REASONS = (
+    "empty-vin",
+    "empty-vout",
+    "bad-value",
+    "outputs-exceed-inputs",
+    "nonstandard-output",
+    "dust",
+    "multi-op-return",
+    "oversize-op-return",
+    "oversize",
+)
+
+# Validation stages in the order a transaction meets them. Each one only
+# sees what the stages before it let through.
+STAGES = ("structure", "conflict", "script")
+
+
+def check_structure(transaction):
+    # Cheap checks on a preprocessed Transaction that need no hashing of
+    # their own and no signatures. Returns the first reason it fails on, or
+    # None.
+    if not transaction.vin:
+        return "empty-vin"
+    if not transaction.vout:
+        return "empty-vout"
+    outputs = transaction.output_values
+    if any(value < 0 or value > MAX_MONEY for value in outputs):
+        return "bad-value"
+    if sum(outputs) > MAX_MONEY:
+        return "bad-value"
+    if sum(transaction.input_values) < sum(outputs):
+        return "outputs-exceed-inputs"
+    op_returns = 0
+    for output, value in zip(transaction.vout, outputs):
+        kind = output.scriptpubkey_type
+        if kind not in STANDARD_OUTPUTS:
+            return "nonstandard-output"
+        if kind == "op_return":
+            op_returns += 1
+            if len(output.scriptpubkey) > MAX_OP_RETURN_SIZE:
+                return "oversize-op-return"
+        elif value < DUST_LIMITS[kind]:
+            return "dust"
+    if op_returns > 1:
+        return "multi-op-return"
+    if transaction.weight > MAX_STANDARD_TX_WEIGHT:
+        return "oversize"
+    return None
+
+
+class Rejections:
+    # Rejected transactions per stage and reason. Inputs of transactions
+    # turned away before the script stage are counted too: each one is a
+    # script run, and at least one signature check, that never happened.
+    def __init__(self):
+        self.entered = Counter()
+        self.reasons = Counter()
+        self.inputs_spared = 0
+
+    def enter(self, stage, count):
+        self.entered[stage] += count
+
+    def reject(self, stage, reason, summary):
+        self.reasons[stage, reason] += 1
+        if stage != "script":
+            self.inputs_spared += len(summary["spends"])
+        metrics.count(f"rejected_{stage}_{reason}")
+
+    def rejected(self, stage):
+        return sum(n for (name, _), n in self.reasons.items() if name == stage)
+
+    def report(self):
+        for stage in STAGES:
+            if stage not in self.entered:
+                continue
+            print(
+                f"Stage {stage}: {self.entered[stage]} checked, "
+                f"{self.rejected(stage)} rejected"
+            )
+            for (name, reason), n in sorted(self.reasons.items()):
+                if name == stage:
+                    print(f"  {reason}: {n}")
+        print(f"Inputs spared script checks: {self.inputs_spared}")
+        metrics.gauge("inputs_spared_script_checks", self.inputs_spared)
@@ -0,0 +1,288 @@
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import metrics
+from mempool_index import build_outpoint_index
+from mempool_loader import MEMPOOL_DIR, iter_mempool
+from validations.p2pkh import p2pkh_signature_job
+from validations.p2wpkh import p2wpkh_signature_job
+from validations.policy import Rejections
+from validations.multisig import MultisigJob, verify_ecdsa
+from validations.script import classify_script, script_signature_jobs
+from validations.sighash import SighashCache
+from validations.taproot import UnsupportedScript, taproot_signature_job
+
+VERIFY_BATCH_SIZE = 512
+
+# Standard single-key templates skip the interpreter entirely.
+FAST_PATHS = {
+    "p2pkh": p2pkh_signature_job,
+    "v0_p2wpkh": p2wpkh_signature_job,
+    "v1_p2tr": taproot_signature_job,
+}
+INTERPRETED = {"p2sh", "v0_p2wsh"}
+# Names the rule set behind a verdict. Change it whenever the checks here
+# change so verdicts cached under the old rules are not reused.
+RULES_TAG = "ecdsa-multisig-taproot-2"
+
+
+def collect_signature_jobs(transaction):
+    # All signature checks a transaction needs. Raises ValueError carrying
+    # the reject reason if one of its inputs fails its script checks or uses
+    # a script type we cannot verify yet.
+    cache = SighashCache(transaction)
+    jobs = []
+    for index, input_data in enumerate(transaction.vin):
+        template = classify_script(input_data.prevout_script)
+        if template not in FAST_PATHS and template not in INTERPRETED:
+            raise ValueError(f"unsupported-script-{template}")
+        try:
+            if template in FAST_PATHS:
+                job = FAST_PATHS[template](transaction, index, cache)
+                if job is None:
+                    raise ValueError
+                jobs.append(job)
+            else:
+                jobs.extend(script_signature_jobs(transaction, index, cache))
+        except UnsupportedScript as error:
+            raise ValueError(f"unsupported-script-{error}") from None
+        except (ValueError, IndexError):
+            raise ValueError("script-failed") from None
+    return jobs
+
+
+def count_sigops(jobs):
+    # CHECKMULTISIG counts one per key, as the sigop limits do.
+    return sum(len(job.pubkeys) if job.__class__ is MultisigJob else 1 for job in jobs)
+
+
+def verify_batch(jobs):
+    # Single-key ECDSA checks are plain tuples; multisig and Schnorr jobs
+    # verify themselves.
+    results = []
+    for job in jobs:
+        if job.__class__ is tuple:
+            results.append(verify_ecdsa(*job))
+        else:
+            results.append(job.verify())
+    return results
+
+
+def _batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+@metrics.timed("validation")
+def verify_signatures(transactions, workers=None, batch_size=VERIFY_BATCH_SIZE):
+    # (valid, reject reason, sigops) per transaction. Jobs from every
+    # transaction are flattened into one list, verified in batches across
+    # worker processes and folded back onto the transaction that owns them.
+    verdicts = []
+    jobs = []
+    owners = []
+    for position, transaction in enumerate(transactions):
+        try:
+            tx_jobs = collect_signature_jobs(transaction)
+        except ValueError as error:
+            verdicts.append((False, str(error), 0))
+            continue
+        verdicts.append((True, None, count_sigops(tx_jobs)))
+        jobs.extend(tx_jobs)
+        owners.extend([position] * len(tx_jobs))
+
+    start = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    batches = list(_batches(jobs, batch_size))
+    if workers == 1 or len(batches) <= 1:
+        results = list(map(verify_batch, batches))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(verify_batch, batches))
+
+    offset = 0
+    for batch_results in results:
+        for ok in batch_results:
+            if not ok:
+                owner = owners[offset]
+                verdicts[owner] = (False, "bad-signature", verdicts[owner][2])
+            offset += 1
+
+    signatures = sum(
+        len(job.signatures) if job.__class__ is MultisigJob else 1 for job in jobs
+    )
+    metrics.count("signatures_verified", signatures)
+    metrics.count("transactions_invalid", sum(not valid for valid, _, _ in verdicts))
+    elapsed = time.perf_counter() - start
+    rate = signatures / elapsed if elapsed else 0.0
+    print(
+        f"Verified {signatures} signatures in {elapsed:.2f}s ({rate:.0f} verifications/sec)"
+    )
+    return verdicts
+
+
+def check_transactions(transactions, workers=None, cache=None):
+    # verify_signatures() behind a VerdictCache: only transactions whose
+    # wtxid has no cached verdict are verified, and their verdicts are
+    # stored. The transactions must carry their wtxid.
+    if cache is None:
+        return verify_signatures(transactions, workers)
+    wtxids = [transaction.wtxid_hex for transaction in transactions]
+    verdicts = cache.get_many(wtxids)
+    missing = [i for i, wtxid in enumerate(wtxids) if wtxid not in verdicts]
+    fresh = (
+        verify_signatures([transactions[i] for i in missing], workers)
+        if missing
+        else []
+    )
+    cache.put_many([(wtxids[i], verdict) for i, verdict in zip(missing, fresh)])
+    verdicts.update((wtxids[i], verdict) for i, verdict in zip(missing, fresh))
+    return [verdicts[wtxid] for wtxid in wtxids]
+
+
+def script_verdicts(summaries, directory=MEMPOOL_DIR, workers=None, cache=None):
+    # {wtxid: (valid, reason, sigops)} for snapshot summaries. Verdicts found
+    # in `cache` are used as they are; only the rest are loaded from disk
+    # and verified.
+    wtxids = [summary["wtxid"] for summary in summaries]
+    verdicts = cache.get_many(wtxids) if cache is not None else {}
+    missing = [summary for summary in summaries if summary["wtxid"] not in verdicts]
+    filenames = [summary["filename"] for summary in missing]
+    transactions = list(iter_mempool(directory, filenames, workers))
+    fresh = verify_signatures(transactions, workers) if transactions else []
+    fresh = list(zip((summary["wtxid"] for summary in missing), fresh))
+    if cache is not None:
+        cache.put_many(fresh)
+        print(f"Verdict cache: {len(verdicts)} hits, {len(missing)} verified")
+    verdicts.update(fresh)
+    return verdicts
+
+
+def validate_mempool(
+    mempool,
+    directory=MEMPOOL_DIR,
+    workers=None,
+    cache=None,
+    rejections=None,
+    verdicts=None,
+):
+    # Verifies the transactions behind the snapshot summaries held in an
+    # OutpointIndex and evicts every one that fails, together with its
+    # in-mempool descendants. `verdicts` holds any already known. Returns
+    # the summaries that can go into a block.
+    summaries = list(mempool.transactions.values())
+    verdicts = dict(verdicts or {})
+    unknown = [summary for summary in summaries if summary["wtxid"] not in verdicts]
+    if unknown:
+        verdicts.update(script_verdicts(unknown, directory, workers, cache))
+
+    if rejections is not None:
+        rejections.enter("script", len(summaries))
+    for summary in summaries:
+        valid, reason, _ = verdicts[summary["wtxid"]]
+        if valid or summary["txid"] not in mempool:
+            continue
+        for removed in mempool.remove_with_descendants(summary["txid"]):
+            if rejections is not None:
+                why = reason if removed is summary else "invalid-ancestor"
+                rejections.reject("script", why, removed)
+    valid = list(mempool.transactions.values())
+    metrics.gauge("transactions_valid", len(valid))
+    print(f"Valid transactions: {len(valid)} of {len(summaries)}")
+    return valid
+
+
+def _with_descendants(txids, spenders, rejected):
+    # Every not yet rejected descendant of `txids`, parents first. Adds
+    # them to `rejected`.
+    found = []
+    pending = list(txids)
+    while pending:
+        for child in spenders.get(pending.pop(), ()):
+            if child["txid"] not in rejected:
+                rejected.add(child["txid"])
+                found.append(child)
+                pending.append(child["txid"])
+    return found
+
+
+def _contested(candidates):
+    # Transactions spending an outpoint another candidate spends too, and
+    # their in-mempool ancestors.
+    by_outpoint = defaultdict(list)
+    for summary in candidates:
+        for outpoint in summary["spends"]:
+            by_outpoint[outpoint].append(summary)
+    contested = {
+        summary["txid"]: summary
+        for group in by_outpoint.values()
+        if len(group) > 1
+        for summary in group
+    }
+    by_txid = {summary["txid"]: summary for summary in candidates}
+    pending = list(contested.values())
+    while pending:
+        for parent, _ in pending.pop()["spends"]:
+            if parent in by_txid and parent not in contested:
+                contested[parent] = by_txid[parent]
+                pending.append(by_txid[parent])
+    return list(contested.values())
+
+
+def screen_mempool(
+    summaries, directory=MEMPOOL_DIR, workers=None, cache=None, rejections=None
+):
+    # Validation ordered by cost, each stage only seeing what the previous
+    # one let through: the structural checks recorded in every summary when
+    # its file was parsed, then outpoint conflicts, then scripts and
+    # signatures. Returns the OutpointIndex and the summaries that passed.
+    if rejections is None:
+        rejections = Rejections()
+    rejections.enter("structure", len(summaries))
+    rejected = set()
+    spenders = defaultdict(list)
+    for summary in summaries:
+        if summary["policy"] is None:
+            for parent, _ in summary["spends"]:
+                spenders[parent].append(summary)
+        else:
+            rejected.add(summary["txid"])
+            rejections.reject("structure", summary["policy"], summary)
+    # Descendants go too: what they spend never reaches the mempool.
+    for child in _with_descendants(list(rejected), spenders, rejected):
+        rejections.reject("structure", "invalid-ancestor", child)
+    candidates = [summary for summary in summaries if summary["txid"] not in rejected]
+
+    # Only script-valid transactions may win a conflict, or a higher-fee
+    # double spend with a bad signature would push out the valid one and
+    # then fail itself. The few transactions in a conflict, and their
+    # ancestors, meet the script stage first.
+    contested = _contested(candidates)
+    verdicts = (
+        script_verdicts(contested, directory, workers, cache) if contested else {}
+    )
+    failed = {
+        summary["txid"]: verdicts[summary["wtxid"]][1]
+        for summary in contested
+        if not verdicts[summary["wtxid"]][0]
+    }
+    if failed:
+        rejected.update(failed)
+        descendants = _with_descendants(list(failed), spenders, rejected)
+        rejections.enter("script", len(failed) + len(descendants))
+        for summary in contested:
+            if summary["txid"] in failed:
+                rejections.reject("script", failed[summary["txid"]], summary)
+        for summary in descendants:
+            rejections.reject("script", "invalid-ancestor", summary)
+        candidates = [s for s in candidates if s["txid"] not in rejected]
+
+    rejections.enter("conflict", len(candidates))
+    index, conflicts = build_outpoint_index(candidates)
+    for summary in conflicts:
+        rejections.reject("conflict", "outpoint-conflict", summary)
+
+    valid = validate_mempool(index, directory, workers, cache, rejections, verdicts)
+    return index, valid
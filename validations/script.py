@@ -0,0 +1,703 @@
+import hashlib
+from functools import lru_cache
+
+from utilities import hash160
+from validations.multisig import MAX_PUBKEYS_PER_MULTISIG, MultisigJob
+
+OP_0 = 0x00
+OP_PUSHDATA1 = 0x4C
+OP_PUSHDATA2 = 0x4D
+OP_PUSHDATA4 = 0x4E
+OP_1NEGATE = 0x4F
+OP_RESERVED = 0x50
+OP_1 = 0x51
+OP_16 = 0x60
+OP_NOP = 0x61
+OP_IF = 0x63
+OP_NOTIF = 0x64
+OP_VERIF = 0x65
+OP_VERNOTIF = 0x66
+OP_ELSE = 0x67
+OP_ENDIF = 0x68
+OP_VERIFY = 0x69
+OP_RETURN = 0x6A
+OP_TOALTSTACK = 0x6B
+OP_FROMALTSTACK = 0x6C
+OP_2DROP = 0x6D
+OP_2DUP = 0x6E
+OP_IFDUP = 0x73
+OP_DEPTH = 0x74
+OP_DROP = 0x75
+OP_DUP = 0x76
+OP_NIP = 0x77
+OP_OVER = 0x78
+OP_PICK = 0x79
+OP_ROLL = 0x7A
+OP_ROT = 0x7B
+OP_SWAP = 0x7C
+OP_TUCK = 0x7D
+OP_SIZE = 0x82
+OP_EQUAL = 0x87
+OP_EQUALVERIFY = 0x88
+OP_1ADD = 0x8B
+OP_1SUB = 0x8C
+OP_NEGATE = 0x8F
+OP_ABS = 0x90
+OP_NOT = 0x91
+OP_0NOTEQUAL = 0x92
+OP_ADD = 0x93
+OP_SUB = 0x94
+OP_BOOLAND = 0x9A
+OP_BOOLOR = 0x9B
+OP_NUMEQUAL = 0x9C
+OP_NUMEQUALVERIFY = 0x9D
+OP_LESSTHAN = 0x9F
+OP_GREATERTHAN = 0xA0
+OP_MIN = 0xA3
+OP_MAX = 0xA4
+OP_WITHIN = 0xA5
+OP_RIPEMD160 = 0xA6
+OP_SHA256 = 0xA8
+OP_HASH160 = 0xA9
+OP_HASH256 = 0xAA
+OP_CODESEPARATOR = 0xAB
+OP_CHECKSIG = 0xAC
+OP_CHECKSIGVERIFY = 0xAD
+OP_CHECKMULTISIG = 0xAE
+OP_CHECKMULTISIGVERIFY = 0xAF
+OP_CHECKLOCKTIMEVERIFY = 0xB1
+OP_CHECKSEQUENCEVERIFY = 0xB2
+
+LOCKTIME_THRESHOLD = 500000000
+SEQUENCE_DISABLE_FLAG = 1 << 31
+SEQUENCE_TYPE_FLAG = 1 << 22
+SEQUENCE_MASK = 0x0000FFFF
+MAX_SCRIPT_SIZE = 10000
+MAX_STACK_SIZE = 1000
+MAX_SCRIPT_ELEMENT_SIZE = 520
+MAX_OPS_PER_SCRIPT = 201
+# Fail the script wherever they appear, executed branch or not: the
+# disabled splice, bitwise and arithmetic opcodes, and OP_VERIF/OP_VERNOTIF.
+ALWAYS_INVALID = frozenset(
+    [0x7E, 0x7F, 0x80, 0x81, 0x83, 0x84, 0x85, 0x86, 0x8D, 0x8E]
+    + [0x95, 0x96, 0x97, 0x98, 0x99, OP_VERIF, OP_VERNOTIF]
+)
+
+
+def parse_pushes(script):
+    # Data pushes of a push-only script (scriptsig), or None if the script
+    # contains anything other than pushes.
+    try:
+        opcodes, operands = _decode(script)
+    except ValueError:
+        return None
+    if any(opcode > OP_16 or opcode == OP_RESERVED for opcode in opcodes):
+        return None
+    pushes = []
+    for opcode, operand in zip(opcodes, operands):
+        if operand is None:
+            operand = encode_number(-1 if opcode == OP_1NEGATE else opcode - 0x50)
+        pushes.append(operand)
+    return pushes
+
+
+def _decode(script):
+    # Compact form of a script: the opcode bytes and, per opcode, the pushed
+    # data (None for non-push opcodes).
+    opcodes = bytearray()
+    operands = []
+    position = 0
+    length = len(script)
+    while position < length:
+        opcode = script[position]
+        position += 1
+        if opcode <= OP_PUSHDATA4:
+            if opcode < OP_PUSHDATA1:
+                size = opcode
+            else:
+                width = 1 << (opcode - OP_PUSHDATA1)
+                if position + width > length:
+                    raise ValueError("Truncated push in script")
+                size = int.from_bytes(script[position : position + width], "little")
+                position += width
+            if position + size > length:
+                raise ValueError("Truncated push in script")
+            operands.append(script[position : position + size])
+            position += size
+        else:
+            operands.append(None)
+        opcodes.append(opcode)
+    return bytes(opcodes), tuple(operands)
+
+
+@lru_cache(maxsize=16384)
+def decode_script(script):
+    # Scripts that get executed (scriptpubkeys, redeem and witness scripts)
+    # repeat across inputs that spend the same wallet's coins, so their
+    # decoded form is cached by script.
+    return _decode(script)
+
+
+def classify_script(script):
+    length = len(script)
+    if length == 25 and script[:3] == b"\x76\xa9\x14" and script[23:] == b"\x88\xac":
+        return "p2pkh"
+    if length == 23 and script[:2] == b"\xa9\x14" and script[22] == OP_EQUAL:
+        return "p2sh"
+    if length == 22 and script[:2] == b"\x00\x14":
+        return "v0_p2wpkh"
+    if length == 34 and script[:2] == b"\x00\x20":
+        return "v0_p2wsh"
+    if length == 34 and script[:2] == b"\x51\x20":
+        return "v1_p2tr"
+    if length and script[0] == OP_RETURN:
+        return "op_return"
+    return "unknown"
+
+
+def witness_program(script):
+    # (version, program) when the script is a segwit output, else None.
+    if not 4 <= len(script) <= 42 or script[1] + 2 != len(script):
+        return None
+    if script[0] == OP_0:
+        return 0, script[2:]
+    if OP_1 <= script[0] <= OP_16:
+        return script[0] - 0x50, script[2:]
+    return None
+
+
+def decode_number(data, max_size=4):
+    if len(data) > max_size:
+        raise ValueError("Script number overflow")
+    if not data:
+        return 0
+    value = int.from_bytes(data, "little")
+    if data[-1] & 0x80:
+        return -(value & ~(0x80 << (8 * (len(data) - 1))))
+    return value
+
+
+def encode_number(value):
+    if value == 0:
+        return b""
+    negative = value < 0
+    magnitude = abs(value)
+    result = bytearray()
+    while magnitude:
+        result.append(magnitude & 0xFF)
+        magnitude >>= 8
+    if result[-1] & 0x80:
+        result.append(0x80 if negative else 0)
+    elif negative:
+        result[-1] |= 0x80
+    return bytes(result)
+
+
+def cast_to_bool(data):
+    for position, byte in enumerate(data):
+        if byte:
+            return not (position == len(data) - 1 and byte == 0x80)
+    return False
+
+
+class SignatureChecker:
+    # Signature checks are not done inline: each one becomes a
+    # (digest, DER signature, pubkey) job for the batch verifier and is
+    # assumed to pass. Only an empty signature evaluates to false, which is
+    # the sole way a failing check may be used under the NULLFAIL policy, so
+    # the deferred result always agrees with the real one for standard
+    # transactions.
+    __slots__ = ("transaction", "index", "cache", "amount", "segwit", "jobs")
+
+    def __init__(self, transaction, index, cache, segwit=False):
+        self.transaction = transaction
+        self.index = index
+        self.cache = cache
+        self.amount = transaction.input_values[index]
+        self.segwit = segwit
+        self.jobs = []
+
+    def _digest(self, signature, script_code):
+        sighash_type = signature[-1]
+        if self.segwit:
+            return self.cache.segwit_digest(
+                self.index, script_code, self.amount, sighash_type
+            )
+        return self.cache.legacy_digest(self.index, script_code, sighash_type)
+
+    def check_signature(self, signature, pubkey, script_code):
+        if not signature:
+            return False
+        digest = self._digest(signature, script_code)
+        self.jobs.append((digest, signature[:-1], pubkey))
+        return True
+
+    def check_multisig(self, signatures, pubkeys, script_code):
+        # Same deferral as check_signature: under NULLFAIL a failing
+        # CHECKMULTISIG must have only empty signatures, so anything else is
+        # queued as one job and assumed to pass.
+        if not signatures:
+            return True
+        if not any(signatures):
+            return False
+        if not all(signatures):
+            raise ValueError("Empty signature in a non-null CHECKMULTISIG")
+        self.jobs.append(
+            MultisigJob(
+                tuple(self._digest(s, script_code) for s in signatures),
+                tuple(s[:-1] for s in signatures),
+                tuple(pubkeys),
+            )
+        )
+        return True
+
+    def check_locktime(self, locktime):
+        tx_locktime = self.transaction.locktime
+        if (locktime < LOCKTIME_THRESHOLD) != (tx_locktime < LOCKTIME_THRESHOLD):
+            return False
+        if locktime > tx_locktime:
+            return False
+        return self.transaction.sequences[self.index] != 0xFFFFFFFF
+
+    def check_sequence(self, sequence):
+        tx_sequence = self.transaction.sequences[self.index]
+        if self.transaction.version < 2 or tx_sequence & SEQUENCE_DISABLE_FLAG:
+            return False
+        mask = SEQUENCE_TYPE_FLAG | SEQUENCE_MASK
+        sequence &= mask
+        tx_sequence &= mask
+        if (sequence & SEQUENCE_TYPE_FLAG) != (tx_sequence & SEQUENCE_TYPE_FLAG):
+            return False
+        return sequence <= tx_sequence
+
+
+class ScriptMachine:
+    __slots__ = ("stack", "altstack", "checker", "script", "op_count")
+
+    def __init__(self, stack, checker, script):
+        self.stack = stack
+        self.altstack = []
+        self.checker = checker
+        self.script = script
+        self.op_count = 0
+
+    def count_ops(self, count):
+        self.op_count += count
+        if self.op_count > MAX_OPS_PER_SCRIPT:
+            raise ValueError("Operation limit exceeded")
+
+    def pop(self):
+        if not self.stack:
+            raise ValueError("Stack underflow")
+        return self.stack.pop()
+
+    def pop_number(self):
+        return decode_number(self.pop())
+
+    def pop_bool(self):
+        return cast_to_bool(self.pop())
+
+    def push_bool(self, value):
+        self.stack.append(b"\x01" if value else b"")
+
+    def verify(self):
+        if not self.pop_bool():
+            raise ValueError("Script verification failed")
+
+
+def _op_small_number(machine, opcode):
+    machine.stack.append(encode_number(opcode - 0x50))
+
+
+def _op_1negate(machine, opcode):
+    machine.stack.append(encode_number(-1))
+
+
+def _op_nop(machine, opcode):
+    pass
+
+
+def _op_verify(machine, opcode):
+    machine.verify()
+
+
+def _op_return(machine, opcode):
+    raise ValueError("OP_RETURN executed")
+
+
+def _op_toaltstack(machine, opcode):
+    machine.altstack.append(machine.pop())
+
+
+def _op_fromaltstack(machine, opcode):
+    if not machine.altstack:
+        raise ValueError("Altstack underflow")
+    machine.stack.append(machine.altstack.pop())
+
+
+def _op_ifdup(machine, opcode):
+    if not machine.stack:
+        raise ValueError("Stack underflow")
+    if cast_to_bool(machine.stack[-1]):
+        machine.stack.append(machine.stack[-1])
+
+
+def _op_depth(machine, opcode):
+    machine.stack.append(encode_number(len(machine.stack)))
+
+
+def _op_drop(machine, opcode):
+    machine.pop()
+
+
+def _op_dup(machine, opcode):
+    if not machine.stack:
+        raise ValueError("Stack underflow")
+    machine.stack.append(machine.stack[-1])
+
+
+def _op_nip(machine, opcode):
+    top = machine.pop()
+    machine.pop()
+    machine.stack.append(top)
+
+
+def _op_over(machine, opcode):
+    if len(machine.stack) < 2:
+        raise ValueError("Stack underflow")
+    machine.stack.append(machine.stack[-2])
+
+
+def _op_2drop(machine, opcode):
+    machine.pop()
+    machine.pop()
+
+
+def _op_2dup(machine, opcode):
+    if len(machine.stack) < 2:
+        raise ValueError("Stack underflow")
+    machine.stack.extend(machine.stack[-2:])
+
+
+def _op_pick(machine, opcode):
+    depth = machine.pop_number()
+    if not 0 <= depth < len(machine.stack):
+        raise ValueError("Stack underflow")
+    item = machine.stack[-depth - 1]
+    if opcode == OP_ROLL:
+        del machine.stack[-depth - 1]
+    machine.stack.append(item)
+
+
+def _op_rot(machine, opcode):
+    if len(machine.stack) < 3:
+        raise ValueError("Stack underflow")
+    machine.stack.append(machine.stack.pop(-3))
+
+
+def _op_tuck(machine, opcode):
+    if len(machine.stack) < 2:
+        raise ValueError("Stack underflow")
+    machine.stack.insert(-2, machine.stack[-1])
+
+
+def _op_swap(machine, opcode):
+    if len(machine.stack) < 2:
+        raise ValueError("Stack underflow")
+    machine.stack[-1], machine.stack[-2] = machine.stack[-2], machine.stack[-1]
+
+
+def _op_size(machine, opcode):
+    if not machine.stack:
+        raise ValueError("Stack underflow")
+    machine.stack.append(encode_number(len(machine.stack[-1])))
+
+
+def _op_equal(machine, opcode):
+    machine.push_bool(machine.pop() == machine.pop())
+    if opcode == OP_EQUALVERIFY:
+        machine.verify()
+
+
+_UNARY = {
+    OP_1ADD: lambda a: a + 1,
+    OP_1SUB: lambda a: a - 1,
+    OP_NEGATE: lambda a: -a,
+    OP_ABS: abs,
+    OP_NOT: lambda a: int(a == 0),
+    OP_0NOTEQUAL: lambda a: int(a != 0),
+}
+
+_BINARY = {
+    OP_ADD: lambda a, b: a + b,
+    OP_SUB: lambda a, b: a - b,
+    OP_BOOLAND: lambda a, b: int(a != 0 and b != 0),
+    OP_BOOLOR: lambda a, b: int(a != 0 or b != 0),
+    OP_NUMEQUAL: lambda a, b: int(a == b),
+    OP_NUMEQUALVERIFY: lambda a, b: int(a == b),
+    OP_LESSTHAN: lambda a, b: int(a < b),
+    OP_GREATERTHAN: lambda a, b: int(a > b),
+    OP_MIN: min,
+    OP_MAX: max,
+}
+
+
+def _op_unary(machine, opcode):
+    machine.stack.append(encode_number(_UNARY[opcode](machine.pop_number())))
+
+
+def _op_binary(machine, opcode):
+    b = machine.pop_number()
+    a = machine.pop_number()
+    machine.stack.append(encode_number(_BINARY[opcode](a, b)))
+    if opcode == OP_NUMEQUALVERIFY:
+        machine.verify()
+
+
+def _op_within(machine, opcode):
+    upper = machine.pop_number()
+    lower = machine.pop_number()
+    value = machine.pop_number()
+    machine.push_bool(lower <= value < upper)
+
+
+def _op_ripemd160(machine, opcode):
+    machine.stack.append(hashlib.new("ripemd160", machine.pop()).digest())
+
+
+def _op_sha256(machine, opcode):
+    machine.stack.append(hashlib.sha256(machine.pop()).digest())
+
+
+def _op_hash160(machine, opcode):
+    machine.stack.append(hash160(machine.pop()))
+
+
+def _op_hash256(machine, opcode):
+    data = machine.pop()
+    machine.stack.append(hashlib.sha256(hashlib.sha256(data).digest()).digest())
+
+
+def _op_checksig(machine, opcode):
+    pubkey = machine.pop()
+    signature = machine.pop()
+    machine.push_bool(
+        machine.checker.check_signature(signature, pubkey, machine.script)
+    )
+    if opcode == OP_CHECKSIGVERIFY:
+        machine.verify()
+
+
+def _op_checkmultisig(machine, opcode):
+    key_count = machine.pop_number()
+    if not 0 <= key_count <= MAX_PUBKEYS_PER_MULTISIG:
+        raise ValueError("Invalid multisig key count")
+    # Each key counts towards the operation limit as well.
+    machine.count_ops(key_count)
+    pubkeys = [machine.pop() for _ in range(key_count)]
+    signature_count = machine.pop_number()
+    if not 0 <= signature_count <= key_count:
+        raise ValueError("Invalid multisig signature count")
+    signatures = [machine.pop() for _ in range(signature_count)]
+    # The extra item CHECKMULTISIG pops; NULLDUMMY requires it to be empty.
+    if machine.pop():
+        raise ValueError("Non-null CHECKMULTISIG dummy")
+    pubkeys.reverse()
+    signatures.reverse()
+    machine.push_bool(
+        machine.checker.check_multisig(signatures, pubkeys, machine.script)
+    )
+    if opcode == OP_CHECKMULTISIGVERIFY:
+        machine.verify()
+
+
+def _op_checklocktimeverify(machine, opcode):
+    if not machine.stack:
+        raise ValueError("Stack underflow")
+    locktime = decode_number(machine.stack[-1], 5)
+    if locktime < 0 or not machine.checker.check_locktime(locktime):
+        raise ValueError("Locktime requirement not satisfied")
+
+
+def _op_checksequenceverify(machine, opcode):
+    if not machine.stack:
+        raise ValueError("Stack underflow")
+    sequence = decode_number(machine.stack[-1], 5)
+    if sequence < 0:
+        raise ValueError("Negative sequence")
+    if sequence & SEQUENCE_DISABLE_FLAG:
+        return
+    if not machine.checker.check_sequence(sequence):
+        raise ValueError("Sequence requirement not satisfied")
+
+
+OPERATIONS = {
+    OP_1NEGATE: _op_1negate,
+    OP_NOP: _op_nop,
+    OP_VERIFY: _op_verify,
+    OP_RETURN: _op_return,
+    OP_TOALTSTACK: _op_toaltstack,
+    OP_FROMALTSTACK: _op_fromaltstack,
+    OP_IFDUP: _op_ifdup,
+    OP_DEPTH: _op_depth,
+    OP_DROP: _op_drop,
+    OP_DUP: _op_dup,
+    OP_NIP: _op_nip,
+    OP_OVER: _op_over,
+    OP_2DROP: _op_2drop,
+    OP_2DUP: _op_2dup,
+    OP_PICK: _op_pick,
+    OP_ROLL: _op_pick,
+    OP_ROT: _op_rot,
+    OP_TUCK: _op_tuck,
+    OP_SWAP: _op_swap,
+    OP_SIZE: _op_size,
+    OP_EQUAL: _op_equal,
+    OP_EQUALVERIFY: _op_equal,
+    OP_WITHIN: _op_within,
+    OP_RIPEMD160: _op_ripemd160,
+    OP_SHA256: _op_sha256,
+    OP_HASH160: _op_hash160,
+    OP_HASH256: _op_hash256,
+    OP_CODESEPARATOR: _op_nop,
+    OP_CHECKSIG: _op_checksig,
+    OP_CHECKSIGVERIFY: _op_checksig,
+    OP_CHECKMULTISIG: _op_checkmultisig,
+    OP_CHECKMULTISIGVERIFY: _op_checkmultisig,
+    OP_CHECKLOCKTIMEVERIFY: _op_checklocktimeverify,
+    OP_CHECKSEQUENCEVERIFY: _op_checksequenceverify,
+}
+OPERATIONS.update(dict.fromkeys(range(OP_1, OP_16 + 1), _op_small_number))
+OPERATIONS.update(dict.fromkeys(_UNARY, _op_unary))
+OPERATIONS.update(dict.fromkeys(_BINARY, _op_binary))
+
+
+def execute_script(script, stack, checker):
+    # Runs `script` on `stack` in place. Raises ValueError when the script
+    # fails or uses an opcode the table does not implement.
+    if len(script) > MAX_SCRIPT_SIZE:
+        raise ValueError("Script too large")
+    opcodes, operands = decode_script(script)
+    machine = ScriptMachine(stack, checker, script)
+    # One entry per open OP_IF; the machine executes only while none of them
+    # is False, and false_count tracks that without rescanning the list.
+    conditions = []
+    false_count = 0
+    for opcode, operand in zip(opcodes, operands):
+        # Limits and invalid opcodes apply in unexecuted branches too.
+        if operand is not None:
+            if len(operand) > MAX_SCRIPT_ELEMENT_SIZE:
+                raise ValueError("Push exceeds the element size limit")
+        elif opcode > OP_16:
+            machine.count_ops(1)
+            if opcode in ALWAYS_INVALID:
+                raise ValueError(f"Disabled opcode {opcode:#04x}")
+        if opcode == OP_IF or opcode == OP_NOTIF:
+            value = False
+            if not false_count:
+                value = machine.pop_bool() != (opcode == OP_NOTIF)
+            conditions.append(value)
+            false_count += not value
+            continue
+        if opcode == OP_ELSE:
+            if not conditions:
+                raise ValueError("Unbalanced conditional")
+            false_count += 1 if conditions[-1] else -1
+            conditions[-1] = not conditions[-1]
+            continue
+        if opcode == OP_ENDIF:
+            if not conditions:
+                raise ValueError("Unbalanced conditional")
+            false_count -= not conditions.pop()
+            continue
+        if false_count:
+            continue
+        if operand is not None:
+            stack.append(operand)
+        else:
+            operation = OPERATIONS.get(opcode)
+            if operation is None:
+                raise ValueError(f"Unsupported opcode {opcode:#04x}")
+            operation(machine, opcode)
+        if len(stack) + len(machine.altstack) > MAX_STACK_SIZE:
+            raise ValueError("Stack size limit exceeded")
+    if conditions:
+        raise ValueError("Unbalanced conditional")
+    return stack
+
+
+P2PKH_PREFIX = b"\x76\xa9\x14"
+P2PKH_SUFFIX = b"\x88\xac"
+
+
+def _execute_witness_program(version, program, witness, checker):
+    if version != 0:
+        raise ValueError(f"Unsupported witness version {version}")
+    stack = list(witness)
+    if len(program) == 20:
+        if len(stack) != 2:
+            raise ValueError("P2WPKH witness must have two items")
+        script = P2PKH_PREFIX + program + P2PKH_SUFFIX
+    elif len(program) == 32:
+        if not stack:
+            raise ValueError("Empty P2WSH witness")
+        script = stack.pop()
+        if hashlib.sha256(script).digest() != program:
+            raise ValueError("Witness script does not match program")
+        if any(len(item) > MAX_SCRIPT_ELEMENT_SIZE for item in stack):
+            raise ValueError("Witness item exceeds the element size limit")
+    else:
+        raise ValueError("Invalid witness program length")
+
+    checker.segwit = True
+    execute_script(script, stack, checker)
+    if len(stack) != 1 or not cast_to_bool(stack[0]):
+        raise ValueError("Witness script did not leave a single true value")
+
+
+def script_signature_jobs(transaction, index, cache):
+    # Evaluates input `index` the way consensus does (scriptsig, then
+    # scriptpubkey, then the P2SH redeem script or the segwit program) and
+    # returns the signature jobs it produced. Raises ValueError when the
+    # scripts fail.
+    input_data = transaction.vin[index]
+    scriptsig = input_data.scriptsig
+    scriptpubkey = input_data.prevout_script
+    checker = SignatureChecker(transaction, index, cache)
+
+    program = witness_program(scriptpubkey)
+    if program is not None:
+        if scriptsig:
+            raise ValueError("Native witness input with a scriptsig")
+        _execute_witness_program(*program, input_data.witness, checker)
+        return checker.jobs
+
+    pushes = parse_pushes(scriptsig)
+    if pushes is None:
+        raise ValueError("Scriptsig is not push-only")
+    if any(len(push) > MAX_SCRIPT_ELEMENT_SIZE for push in pushes):
+        raise ValueError("Push exceeds the element size limit")
+    stack = list(pushes)
+    execute_script(scriptpubkey, stack, checker)
+    if not stack or not cast_to_bool(stack[-1]):
+        raise ValueError("Scriptpubkey evaluated to false")
+
+    if classify_script(scriptpubkey) == "p2sh":
+        if not pushes:
+            raise ValueError("Missing redeem script")
+        redeem_script = pushes[-1]
+        program = witness_program(redeem_script)
+        if program is not None:
+            if len(pushes) != 1:
+                raise ValueError("Wrapped witness input with extra pushes")
+            _execute_witness_program(*program, input_data.witness, checker)
+            return checker.jobs
+        stack = pushes[:-1]
+        execute_script(redeem_script, stack, checker)
+        if not stack or not cast_to_bool(stack[-1]):
+            raise ValueError("Redeem script evaluated to false")
+        if len(stack) != 1:
+            raise ValueError("Redeem script left extra stack items")
+    elif input_data.witness:
+        raise ValueError("Unexpected witness data")
+    return checker.jobs
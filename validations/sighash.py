@@ -0,0 +1,184 @@
+import hashlib
+import struct
+
+from utilities import double_sha256
+from transaction_serialization import write_compact_size
+
+SIGHASH_ALL = 0x01
+SIGHASH_NONE = 0x02
+SIGHASH_SINGLE = 0x03
+SIGHASH_ANYONECANPAY = 0x80
+
+_U32 = struct.Struct("<I").pack
+_U64 = struct.Struct("<Q").pack
+_ZERO_HASH = bytes(32)
+# Legacy SIGHASH_SINGLE with no matching output signs this constant.
+_ONE_HASH = (1).to_bytes(32, "little")
+SIGHASH_DEFAULT = 0x00
+TAPROOT_SIGHASH_TYPES = {0x00, 0x01, 0x02, 0x03, 0x81, 0x82, 0x83}
+# BIP340 tagged-hash prefix for "TapSighash", sha256(tag) twice, followed by
+# the sighash epoch byte.
+_TAP_SIGHASH_PREFIX = hashlib.sha256(b"TapSighash").digest() * 2 + b"\x00"
+
+
+def _sha256(data):
+    return hashlib.sha256(data).digest()
+
+
+def outpoint_bytes(input_data):
+    return input_data.txid + _U32(input_data.vout)
+
+
+def output_bytes(output, value):
+    buffer = bytearray(_U64(value))
+    write_compact_size(buffer, len(output.scriptpubkey))
+    buffer += output.scriptpubkey
+    return bytes(buffer)
+
+
+class SighashCache:
+    # Serialized pieces of one transaction plus the three BIP143 hashes that
+    # are shared by all of its inputs, so each input digest only has to
+    # hash its own preimage.
+    def __init__(self, transaction):
+        self.transaction = transaction
+        self.version = _U32(transaction.version)
+        self.locktime = _U32(transaction.locktime)
+        self.outpoints = [outpoint_bytes(i) for i in transaction.vin]
+        self.sequences = [_U32(sequence) for sequence in transaction.sequences]
+        self.outputs = [
+            output_bytes(output, value)
+            for output, value in zip(transaction.vout, transaction.output_values)
+        ]
+        self.hash_prevouts = double_sha256(b"".join(self.outpoints))
+        self.hash_sequence = double_sha256(b"".join(self.sequences))
+        self.hash_outputs = double_sha256(b"".join(self.outputs))
+        self.taproot_hashes = None
+
+    def _taproot_hashes(self):
+        # BIP341 single-SHA256 hashes over every input and output, built on
+        # the first taproot digest and shared by the rest.
+        transaction = self.transaction
+        scriptpubkeys = bytearray()
+        for input_data in transaction.vin:
+            write_compact_size(scriptpubkeys, len(input_data.prevout_script))
+            scriptpubkeys += input_data.prevout_script
+        self.taproot_hashes = (
+            _sha256(b"".join(self.outpoints)),
+            _sha256(b"".join(_U64(value) for value in transaction.input_values)),
+            _sha256(scriptpubkeys),
+            _sha256(b"".join(self.sequences)),
+            _sha256(b"".join(self.outputs)),
+        )
+        return self.taproot_hashes
+
+    def legacy_digest(self, index, script_code, sighash_type):
+        base_type = sighash_type & 0x1F
+        anyone_can_pay = sighash_type & SIGHASH_ANYONECANPAY
+        if base_type == SIGHASH_SINGLE and index >= len(self.outputs):
+            return _ONE_HASH
+
+        positions = [index] if anyone_can_pay else range(len(self.outpoints))
+        preimage = bytearray(self.version)
+        write_compact_size(preimage, len(positions))
+        for position in positions:
+            preimage += self.outpoints[position]
+            if position == index:
+                write_compact_size(preimage, len(script_code))
+                preimage += script_code
+                preimage += self.sequences[position]
+            elif base_type in (SIGHASH_NONE, SIGHASH_SINGLE):
+                preimage += b"\x00" + _U32(0)
+            else:
+                preimage += b"\x00" + self.sequences[position]
+
+        if base_type == SIGHASH_NONE:
+            write_compact_size(preimage, 0)
+        elif base_type == SIGHASH_SINGLE:
+            write_compact_size(preimage, index + 1)
+            for _ in range(index):
+                preimage += _U64(0xFFFFFFFFFFFFFFFF) + b"\x00"
+            preimage += self.outputs[index]
+        else:
+            write_compact_size(preimage, len(self.outputs))
+            for output in self.outputs:
+                preimage += output
+
+        preimage += self.locktime
+        preimage += _U32(sighash_type)
+        return double_sha256(preimage)
+
+    def segwit_digest(self, index, script_code, amount, sighash_type):
+        # BIP143 digest for input `index`; script_code excludes its length
+        # prefix.
+        base_type = sighash_type & 0x1F
+        anyone_can_pay = sighash_type & SIGHASH_ANYONECANPAY
+
+        hash_prevouts = _ZERO_HASH if anyone_can_pay else self.hash_prevouts
+        hash_sequence = self.hash_sequence
+        if anyone_can_pay or base_type in (SIGHASH_SINGLE, SIGHASH_NONE):
+            hash_sequence = _ZERO_HASH
+        hash_outputs = self.hash_outputs
+        if base_type == SIGHASH_SINGLE:
+            hash_outputs = _ZERO_HASH
+            if index < len(self.outputs):
+                hash_outputs = double_sha256(self.outputs[index])
+        elif base_type == SIGHASH_NONE:
+            hash_outputs = _ZERO_HASH
+
+        preimage = bytearray(self.version)
+        preimage += hash_prevouts
+        preimage += hash_sequence
+        preimage += self.outpoints[index]
+        write_compact_size(preimage, len(script_code))
+        preimage += script_code
+        preimage += _U64(amount)
+        preimage += self.sequences[index]
+        preimage += hash_outputs
+        preimage += self.locktime
+        preimage += _U32(sighash_type)
+        return double_sha256(preimage)
+
+    def taproot_digest(self, index, hash_type, annex=None):
+        # BIP341 key-path digest (extension flag 0) for input `index`.
+        # Raises ValueError for an undefined hash type or a SIGHASH_SINGLE
+        # input without a matching output.
+        if hash_type not in TAPROOT_SIGHASH_TYPES:
+            raise ValueError("Invalid taproot sighash type")
+        base_type = hash_type & 0x03
+        anyone_can_pay = hash_type & SIGHASH_ANYONECANPAY
+        transaction = self.transaction
+        sha_prevouts, sha_amounts, sha_scriptpubkeys, sha_sequences, sha_outputs = (
+            self.taproot_hashes or self._taproot_hashes()
+        )
+
+        message = bytearray(_TAP_SIGHASH_PREFIX)
+        message.append(hash_type)
+        message += self.version
+        message += self.locktime
+        if not anyone_can_pay:
+            message += sha_prevouts
+            message += sha_amounts
+            message += sha_scriptpubkeys
+            message += sha_sequences
+        if base_type not in (SIGHASH_NONE, SIGHASH_SINGLE):
+            message += sha_outputs
+        message.append(0 if annex is None else 1)
+        if anyone_can_pay:
+            input_data = transaction.vin[index]
+            message += self.outpoints[index]
+            message += _U64(transaction.input_values[index])
+            write_compact_size(message, len(input_data.prevout_script))
+            message += input_data.prevout_script
+            message += self.sequences[index]
+        else:
+            message += _U32(index)
+        if annex is not None:
+            prefixed = bytearray()
+            write_compact_size(prefixed, len(annex))
+            message += _sha256(prefixed + annex)
+        if base_type == SIGHASH_SINGLE:
+            if index >= len(self.outputs):
+                raise ValueError("SIGHASH_SINGLE without a matching output")
+            message += _sha256(self.outputs[index])
+        return _sha256(message)
@@ -0,0 +1,65 @@
+from functools import lru_cache
+
+from coincurve import PublicKeyXOnly
+
+from validations.sighash import SIGHASH_DEFAULT
+
+ANNEX_TAG = 0x50
+
+
+class UnsupportedScript(ValueError):
+    # A spend that may well be valid but that we have no checks for yet.
+    pass
+
+
+@lru_cache(maxsize=8192)
+def load_xonly_pubkey(data):
+    # Lifting an x-only key costs a square root, same as a compressed one.
+    return PublicKeyXOnly(data)
+
+
+def verify_schnorr(digest, signature, pubkey):
+    try:
+        return load_xonly_pubkey(pubkey).verify(signature, digest)
+    except ValueError:
+        return False
+
+
+class SchnorrJob:
+    # One BIP340 check for the batch verifier: the 32-byte BIP341 digest,
+    # the 64-byte signature and the x-only output key.
+    __slots__ = ("digest", "signature", "pubkey")
+
+    def __init__(self, digest, signature, pubkey):
+        self.digest = digest
+        self.signature = signature
+        self.pubkey = pubkey
+
+    def verify(self):
+        return verify_schnorr(self.digest, self.signature, self.pubkey)
+
+
+def taproot_signature_job(transaction, index, cache):
+    # Key-path spends only: the witness is a lone signature, optionally
+    # followed by an annex. Anything longer is a script-path spend.
+    input_data = transaction.vin[index]
+    scriptpubkey = input_data.prevout_script
+    witness = input_data.witness
+    if input_data.scriptsig or not witness or len(scriptpubkey) != 34:
+        return None
+    annex = None
+    if len(witness) >= 2 and witness[-1][:1] == bytes([ANNEX_TAG]):
+        annex = witness[-1]
+        witness = witness[:-1]
+    if len(witness) != 1:
+        raise UnsupportedScript("v1_p2tr-script-path")
+    signature = witness[0]
+    if len(signature) == 64:
+        hash_type = SIGHASH_DEFAULT
+    elif len(signature) == 65 and signature[-1] != SIGHASH_DEFAULT:
+        # An explicit 0x00 would give the same digest a second encoding.
+        signature, hash_type = signature[:-1], signature[-1]
+    else:
+        return None
+    digest = cache.taproot_digest(index, hash_type, annex)
+    return SchnorrJob(digest, signature, scriptpubkey[2:])
@@ -0,0 +1,105 @@
+import os
+import sqlite3
+
+import metrics
+from mempool_cache import CACHE_DIR
+
+VERDICT_FILE = "verdicts.sqlite"
+MAX_VERDICTS = 200000
+# SQLite limits the number of bound parameters per statement.
+_QUERY_CHUNK = 500
+
+
+class VerdictCache:
+    # Script verdicts on disk, keyed by wtxid and the tag of the rule set
+    # that produced them. An outpoint always names the same output, so a
+    # wtxid fixes the prevouts too and its verdict only changes with the
+    # rules. Each open starts a new generation; hits are stamped with it and
+    # the oldest generations are evicted once the table outgrows max_entries.
+    def __init__(self, tag, cache_dir=CACHE_DIR, max_entries=MAX_VERDICTS):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.tag = tag
+        self.max_entries = max_entries
+        # Owners may move the cache to another thread (the job server polls
+        # the mempool from an executor) but never use it from two at once.
+        self.db = sqlite3.connect(
+            os.path.join(cache_dir, VERDICT_FILE), check_same_thread=False
+        )
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS verdicts (
+                wtxid BLOB NOT NULL,
+                tag TEXT NOT NULL,
+                valid INTEGER NOT NULL,
+                reason TEXT,
+                sigops INTEGER NOT NULL,
+                last_used INTEGER NOT NULL,
+                PRIMARY KEY (wtxid, tag)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS verdicts_last_used
+                ON verdicts (last_used);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER);
+            INSERT OR IGNORE INTO meta VALUES ('generation', 0);
+            UPDATE meta SET value = value + 1 WHERE key = 'generation';
+            """)
+        (self.generation,) = self.db.execute(
+            "SELECT value FROM meta WHERE key = 'generation'"
+        ).fetchone()
+        self.db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        self.db.close()
+
+    def get_many(self, wtxids):
+        # {wtxid: (valid, reason, sigops)} for the wtxids (hex) that are
+        # cached under this tag.
+        found = {}
+        keys = [bytes.fromhex(wtxid) for wtxid in wtxids]
+        for start in range(0, len(keys), _QUERY_CHUNK):
+            chunk = keys[start : start + _QUERY_CHUNK]
+            rows = self.db.execute(
+                "SELECT wtxid, valid, reason, sigops FROM verdicts "
+                f"WHERE tag = ? AND wtxid IN ({','.join('?' * len(chunk))})",
+                [self.tag, *chunk],
+            )
+            for wtxid, valid, reason, sigops in rows:
+                found[wtxid.hex()] = (bool(valid), reason, sigops)
+        self.db.executemany(
+            "UPDATE verdicts SET last_used = ? WHERE wtxid = ? AND tag = ?",
+            [(self.generation, bytes.fromhex(w), self.tag) for w in found],
+        )
+        self.db.commit()
+        metrics.count("verdict_cache_hits", len(found))
+        metrics.count("verdict_cache_misses", len(keys) - len(found))
+        return found
+
+    def put_many(self, verdicts):
+        # verdicts: (wtxid hex, (valid, reason, sigops)) pairs.
+        self.db.executemany(
+            "INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    bytes.fromhex(wtxid),
+                    self.tag,
+                    int(valid),
+                    reason,
+                    sigops,
+                    self.generation,
+                )
+                for wtxid, (valid, reason, sigops) in verdicts
+            ],
+        )
+        (count,) = self.db.execute("SELECT COUNT(*) FROM verdicts").fetchone()
+        if count > self.max_entries:
+            self.db.execute(
+                "DELETE FROM verdicts WHERE (wtxid, tag) IN ("
+                "SELECT wtxid, tag FROM verdicts ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,),
+            )
+        self.db.commit()
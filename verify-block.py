@@ -0,0 +1,26 @@
+import argparse
+import time
+
+from block.verify import verify_block_file
+from mempool_cache import load_snapshot
+
+OUTPUT_FILE = "output.txt"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify a mined block")
+    parser.add_argument("block", nargs="?", default=OUTPUT_FILE)
+    args = parser.parse_args()
+
+    mempool = {tx["txid"]: tx for tx in load_snapshot()}
+    start = time.perf_counter()
+    total_weight, total_fee = verify_block_file(args.block, mempool)
+    elapsed = time.perf_counter() - start
+    print(
+        f"Block is valid with a total weight of {total_weight} and a total fee "
+        f"of {total_fee}! (verified in {elapsed:.3f}s)"
+    )
+
+
+if __name__ == "__main__":
+    main()